@@ -0,0 +1,84 @@
+"""Convert an LBPH model between OpenCV's YAML (trainer.yml) and the binary format.
+
+Usage:
+    python Frontend/ConvertModel.py [source] [destination] [--storage uint8] [--verify]
+
+By default the repo's trainer.yml is converted to trainer.lbph, which the
+application loads in its place. The format of each file follows its
+extension (.yml/.yaml/.xml: OpenCV, anything else: binary), so a binary
+model can also be turned back into a trainer.yml for
+`LBPHFaceRecognizer.read`. A binary model keeps its histograms in
+--storage: float32, float16 or uint8 counts with a per-row scale (the
+application's default). With --verify the written file is read back and
+compared with the source, stored the same way: labels, parameters and every
+histogram must match exactly, and so must the predictions for a sample of
+stored histograms. The number of samples whose histogram changed in the
+conversion is reported.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from LBPHGallery import STORAGES, LBPHGallery, is_opencv_model_path, load_lbph_model, save_lbph_model
+from RecognitionBackends import _replace_file
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def verify(source, converted, samples=100):
+    """Differences between two models; an empty list when they are identical."""
+    problems = []
+    for name in ('radius', 'neighbors', 'grid_x', 'grid_y', 'threshold'):
+        if getattr(source, name) != getattr(converted, name):
+            problems.append(f"{name}: {getattr(source, name)} != {getattr(converted, name)}")
+    if not np.array_equal(source.labels, converted.labels):
+        problems.append("labels differ")
+    if source.histograms.shape != converted.histograms.shape:
+        problems.append(f"histogram shape {source.histograms.shape} != {converted.histograms.shape}")
+    elif not np.array_equal(source.histograms, converted.histograms):
+        problems.append("histograms differ")
+    elif len(source.labels):
+        rows = np.random.default_rng(0).choice(len(source.labels), min(samples, len(source.labels)), replace=False)
+        queries = source.histograms[rows]
+        if LBPHGallery(source).match(queries) != LBPHGallery(converted).match(queries):
+            problems.append("predictions differ")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', nargs='?', default=os.path.join(_REPO_ROOT, 'trainer.yml'))
+    parser.add_argument('destination', nargs='?', default=os.path.join(_REPO_ROOT, 'trainer.lbph'))
+    parser.add_argument('--storage', choices=STORAGES, default='uint8', help='histogram storage of a binary model')
+    parser.add_argument('--verify', action='store_true', help='read the result back and compare it with the source')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = load_lbph_model(args.source)
+    print(f"[INFO] Read {len(model.labels)} samples from {args.source} in {time.perf_counter() - start:.2f} s")
+    stored = model if is_opencv_model_path(args.destination) else model.quantized(args.storage)
+    changed = int(np.count_nonzero(np.any(stored.histograms != model.histograms, axis=1)))
+    if changed:
+        print(f"[INFO] {changed} of {len(model.labels)} histograms are rounded in {stored.storage} storage")
+
+    # Replaced atomically like a training run does, so a failed conversion never leaves a partial model
+    _replace_file(args.destination, lambda path: save_lbph_model(stored, path))
+    print(f"[INFO] Wrote {args.destination} ({os.path.getsize(args.source) / 1e6:.1f} MB -> "
+          f"{os.path.getsize(args.destination) / 1e6:.1f} MB)")
+
+    if args.verify:
+        start = time.perf_counter()
+        converted = load_lbph_model(args.destination)
+        print(f"[INFO] Read back in {time.perf_counter() - start:.3f} s")
+        problems = verify(stored, converted)
+        for problem in problems:
+            print(f"[ERROR] {problem}")
+        if problems:
+            raise SystemExit(1)
+        print("[INFO] Round trip verified: identical labels, parameters, histograms and predictions")
+
+
+if __name__ == '__main__':
+    main()
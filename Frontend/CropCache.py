@@ -0,0 +1,125 @@
+import numpy as np
+
+from SampleManifest import connect, directory_key
+
+# Names per query; stays below SQLite's limit on bound parameters
+_QUERY_NAMES = 500
+
+
+def detector_key(detector):
+    """Identify a detector configuration: crops cached with another one are detected again."""
+    settings = sorted((name, value) for name, value in vars(detector).items()
+                      if not name.startswith('_') and isinstance(value, (bool, int, float, str, tuple)))
+    return f"{type(detector).__name__}{settings}"
+
+
+class CropCache:
+    """Face crops found in the training images, so each image is only decoded and detected once.
+
+    Entries live in the `face_crops` table of the app database, one row per
+    image of `directory` and crop kind ('gray' or 'bgr'): the image's mtime
+    and size, the detector configuration (`key`) and the crops as one blob
+    with their shapes. An entry is stale when the file's mtime or size
+    changed or another detector produced it. `load` reads only the images
+    asked for, and `save` writes only the entries `put` since, so enrolling
+    one person touches only that person's crops.
+    """
+
+    def __init__(self, directory, kind, key, path=None):
+        self.directory = directory_key(directory)
+        self.kind = kind
+        self.key = key
+        self.entries = {}
+        self._pending = {}
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS face_crops (
+                    directory TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    detector TEXT NOT NULL,
+                    shapes BLOB NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (directory, kind, name))
+            """)
+
+    def close(self):
+        self._conn.close()
+
+    def load(self, names):
+        """Read the cached crops of the images `names`; returns self."""
+        self.entries = {}
+        self._pending = {}
+        names = list(names)
+        stale = 0
+        for start in range(0, len(names), _QUERY_NAMES):
+            chunk = names[start:start + _QUERY_NAMES]
+            rows = self._conn.execute(
+                "SELECT name, mtime_ns, size, detector, shapes, data FROM face_crops "
+                f"WHERE directory = ? AND kind = ? AND name IN ({', '.join('?' * len(chunk))})",
+                [self.directory, self.kind] + chunk)
+            for name, mtime_ns, size, detector, shapes, data in rows:
+                if detector != self.key:
+                    stale += 1
+                    continue
+                self.entries[name] = (mtime_ns, size, _unpack(shapes, data))
+        if stale:
+            print(f"[INFO] Face detector changed; {stale} cached image(s) will be detected again")
+        return self
+
+    def get(self, name, mtime_ns, size):
+        """Cached crops of image `name` with that mtime and size, or None when missing or stale."""
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != mtime_ns or entry[1] != size:
+            return None
+        return entry[2]
+
+    def put(self, name, mtime_ns, size, crops):
+        entry = (int(mtime_ns), int(size), [np.ascontiguousarray(crop) for crop in crops])
+        self.entries[name] = entry
+        self._pending[name] = entry
+
+    def prune(self, names):
+        """Forget images of the directory that are no longer among `names`."""
+        keep = set(names)
+        stale = [(self.directory, self.kind, name) for (name,) in self._conn.execute(
+            "SELECT name FROM face_crops WHERE directory = ? AND kind = ?", (self.directory, self.kind))
+            if name not in keep]
+        with self._conn:
+            self._conn.executemany("DELETE FROM face_crops WHERE directory = ? AND kind = ? AND name = ?", stale)
+        for _, _, name in stale:
+            self.entries.pop(name, None)
+
+    def save(self):
+        """Write the entries `put` since the last load or save, in one transaction."""
+        if not self._pending:
+            return
+        rows = [(self.directory, self.kind, name, mtime_ns, size, self.key) + _pack(crops)
+                for name, (mtime_ns, size, crops) in self._pending.items()]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO face_crops (directory, kind, name, mtime_ns, size, detector, shapes, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._pending = {}
+
+
+def _pack(crops):
+    # Shapes padded to three dimensions (channels 0 for grayscale), then all pixels back to back
+    shapes = np.array([crop.shape + (0,) * (3 - crop.ndim) for crop in crops], dtype='<i4').reshape(-1, 3)
+    return shapes.tobytes(), b''.join(crop.tobytes() for crop in crops)
+
+
+def _unpack(shapes, data):
+    shapes = np.frombuffer(shapes, dtype='<i4').reshape(-1, 3)
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    crops, offset = [], 0
+    for h, w, c in shapes.tolist():
+        shape = (h, w, c) if c else (h, w)
+        size = h * w * max(c, 1)
+        # Copied, so the crop does not keep the whole row's blob alive
+        crops.append(buffer[offset:offset + size].reshape(shape).copy())
+        offset += size
+    return crops
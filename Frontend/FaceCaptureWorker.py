@@ -1,21 +1,24 @@
 import os
-import json
 import cv2
-import numpy as np
 from PyQt5 import QtCore, QtGui
 
+from FaceDetector import create_detector
+from SampleManifest import SampleManifest
+from UserRegistry import UserRegistry
+
 
 class FaceCaptureWorker(QtCore.QObject):
     frame_updated = QtCore.pyqtSignal(QtGui.QImage)
     capture_finished = QtCore.pyqtSignal()
 
-    def __init__(self, preview_label: QtGui.QImage = None, target_count=30, image_dir='images', json_file='names.json'):
+    def __init__(self, preview_label: QtGui.QImage = None, target_count=30, image_dir='images', detector='ssd'):
         super().__init__()
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.update_frame)
 
         self.capture = None
-        self.net = None
+        self.detector_backend = detector
+        self.detector = None
 
         self.face_id = None
         self.face_name = ""
@@ -29,17 +32,19 @@ class FaceCaptureWorker(QtCore.QObject):
         self._repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         self._models_dir = os.path.join(self._repo_root, 'real-time-face-recognition')
         self.image_dir = os.path.join(self._repo_root, image_dir)
-        self.json_file = os.path.join(self._repo_root, json_file)
+        self.registry = UserRegistry()
+        # Every crop written is recorded here, with its hash and quality score
+        self.manifest = SampleManifest(self.image_dir)
 
         self.preview_label = preview_label  # Optional QLabel reference (not used directly here)
 
         self.load_model()
 
     def load_model(self):
-        self.net = cv2.dnn.readNetFromCaffe(
-            os.path.join(self._models_dir, 'deploy.prototxt'),
-            os.path.join(self._models_dir, 'res10_300x300_ssd_iter_140000.caffemodel')
-        )
+        if isinstance(self.detector_backend, str):
+            self.detector = create_detector(self.detector_backend, conf_threshold=0.6)
+        else:
+            self.detector = self.detector_backend
 
     def start_capture(self, name: str, roll: str, contact: str):
         self.face_name = name
@@ -49,8 +54,8 @@ class FaceCaptureWorker(QtCore.QObject):
         if not os.path.exists(self.image_dir):
             os.makedirs(self.image_dir)
 
-        self.face_id = self.get_next_face_id()
-        self.save_name_json()
+        # Registered with the first saved face, so a capture that gets none leaves no one behind
+        self.face_id = None
 
         self.capture = cv2.VideoCapture(0)
         self.frame_count = 0
@@ -68,20 +73,15 @@ class FaceCaptureWorker(QtCore.QObject):
         if not ret:
             return
 
-        h, w = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0))
-        self.net.setInput(blob)
-        detections = self.net.forward()
-
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.6:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                face_crop = frame[y:y1, x:x1]
-                self.frame_count += 1
-                cv2.imwrite(f"{self.image_dir}/User-{self.face_id}-{self.frame_count}.jpg", face_crop)
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
+        boxes, _ = self.detector.detect(frame)
+        for (x, y, x1, y1) in boxes:
+            face_crop = frame[y:y1, x:x1]
+            if self.face_id is None:
+                # Capturing a registered roll number again retakes that person's photos
+                self.face_id = self.registry.register(self.manifest, self.face_name, self.roll_no, self.contact)
+            self.frame_count += 1
+            self.manifest.save_face(self.face_id, self.frame_count, face_crop)
+            cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
 
         rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         qt_image = QtGui.QImage(rgb_image.data, rgb_image.shape[1], rgb_image.shape[0], QtGui.QImage.Format_RGB888)
@@ -91,29 +91,4 @@ class FaceCaptureWorker(QtCore.QObject):
             self.stop_capture()
 
     def get_next_face_id(self):
-        user_ids = set()
-        for filename in os.listdir(self.image_dir):
-            try:
-                number = int(filename.split("-")[1])
-                user_ids.add(number)
-            except (IndexError, ValueError):
-                continue
-        return min(set(range(1, max(user_ids, default=0) + 2)) - user_ids)
-
-    def save_name_json(self):
-        data = {}
-        if os.path.exists(self.json_file):
-            with open(self.json_file, 'r') as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    pass
-
-        data[str(self.face_id)] = {
-            "name": self.face_name,
-            "roll_no": self.roll_no,
-            "contact": self.contact
-        }
-
-        with open(self.json_file, 'w') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        return self.registry.next_free_id(self.manifest)
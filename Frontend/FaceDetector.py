@@ -0,0 +1,205 @@
+import os
+
+import cv2
+import numpy as np
+
+
+def postprocess_detections(detections, width, height, conf_threshold=0.6, nms_threshold=None,
+                           return_scores=False, image_index=None):
+    """Turn a raw SSD output tensor into clipped integer face boxes in one pass.
+
+    `detections` is the (1, 1, N, 7) array returned by the res10 SSD forward
+    pass. Rows under `conf_threshold` are dropped, the remaining normalised
+    coordinates are scaled to `width` x `height`, clipped to the image and
+    boxes that end up empty are discarded. When `nms_threshold` is given,
+    overlapping boxes are suppressed with OpenCV's NMS. For the output of a
+    batched `blobFromImages` pass, `image_index` selects the rows that belong
+    to one image of the batch.
+
+    Returns an (M, 4) int array of (x, y, x1, y1) boxes, plus an (M,) float
+    array of scores when `return_scores` is set.
+    """
+    rows = detections.reshape(-1, 7)
+    if image_index is not None:
+        rows = rows[rows[:, 0] == image_index]
+    rows = rows[rows[:, 2] > conf_threshold]
+    scores = rows[:, 2].astype(np.float32)
+
+    boxes = rows[:, 3:7] * np.array([width, height, width, height], dtype=np.float32)
+    boxes = boxes.astype(np.int32)
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+
+    valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    boxes, scores = boxes[valid], scores[valid]
+
+    if nms_threshold is not None and len(boxes) > 1:
+        xywh = np.column_stack((boxes[:, :2], boxes[:, 2:] - boxes[:, :2])).tolist()
+        keep = np.asarray(cv2.dnn.NMSBoxes(xywh, scores.tolist(), conf_threshold, nms_threshold),
+                          dtype=np.int64).reshape(-1)
+        keep.sort()
+        boxes, scores = boxes[keep], scores[keep]
+
+    if return_scores:
+        return boxes, scores
+    return boxes
+
+
+_MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'real-time-face-recognition'))
+
+
+class FaceDetector:
+    """Common interface for the interchangeable face detector backends.
+
+    `detect` returns an (M, 4) int array of (x, y, x1, y1) boxes clipped to the
+    frame and an (M,) float array of scores. `detect_batch` does the same for
+    a list of frames; backends that can batch their forward pass override it.
+    """
+
+    name = None
+
+    def detect(self, frame):
+        raise NotImplementedError
+
+    def detect_batch(self, frames):
+        return [self.detect(frame) for frame in frames]
+
+
+class SSDBlobBuilder:
+    """Builds the SSD input blob into reusable buffers.
+
+    Produces the same NCHW, mean-subtracted float32 blob as
+    `cv2.dnn.blobFromImages(frames, 1.0, input_size, mean)` but writes it into
+    a buffer that is only reallocated when the batch size changes.
+    """
+
+    def __init__(self, input_size=(300, 300), mean=(104.0, 177.0, 123.0)):
+        self.input_size = tuple(input_size)
+        self.mean = tuple(mean) + (0.0,)
+        (w, h) = self.input_size
+        self._resized = np.empty((h, w, 3), dtype=np.uint8)
+        self._centered = np.empty((h, w, 3), dtype=np.float32)
+        self._blob = np.empty((1, 3, h, w), dtype=np.float32)
+
+    def build(self, frames):
+        (w, h) = self.input_size
+        if self._blob.shape[0] != len(frames):
+            self._blob = np.empty((len(frames), 3, h, w), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            cv2.resize(frame, self.input_size, dst=self._resized)
+            # Subtract and widen to float32 in OpenCV, then one same-dtype HWC -> CHW copy
+            cv2.subtract(self._resized, self.mean, dst=self._centered, dtype=cv2.CV_32F)
+            np.copyto(self._blob[i], self._centered.transpose(2, 0, 1))
+        return self._blob
+
+
+class CaffeSSDDetector(FaceDetector):
+    """The res10 SSD face detector; `input_size` trades recall for speed."""
+
+    name = 'ssd'
+
+    def __init__(self, proto_path=None, model_path=None, input_size=(300, 300), conf_threshold=0.6,
+                 nms_threshold=None):
+        self.proto_path = proto_path or os.path.join(_MODELS_DIR, 'deploy.prototxt')
+        self.model_path = model_path or os.path.join(_MODELS_DIR, 'res10_300x300_ssd_iter_140000.caffemodel')
+        self.input_size = tuple(input_size)
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.net = cv2.dnn.readNetFromCaffe(self.proto_path, self.model_path)
+        self.blob_builder = SSDBlobBuilder(self.input_size)
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        # One forward pass for the whole batch; column 0 of each row is the image index
+        blob = self.blob_builder.build(frames)
+        self.net.setInput(blob)
+        detections = self.net.forward()
+
+        results = []
+        for i, frame in enumerate(frames):
+            (h, w) = frame.shape[:2]
+            results.append(postprocess_detections(detections, w, h, self.conf_threshold, self.nms_threshold,
+                                                  return_scores=True, image_index=i))
+        return results
+
+
+class HaarCascadeDetector(FaceDetector):
+    """Viola-Jones cascade shipped with the legacy scripts; cheapest, lowest recall.
+
+    The cascade has no calibrated confidence, so `conf_threshold` is accepted
+    for interface compatibility only; `min_neighbors` is the knob to tune.
+    """
+
+    name = 'haar'
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=(30, 30),
+                 conf_threshold=None):
+        self.cascade_path = cascade_path or os.path.join(_MODELS_DIR, 'haarcascade_frontalface_default.xml')
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+        self.cascade = cv2.CascadeClassifier(self.cascade_path)
+        if self.cascade.empty():
+            raise FileNotFoundError(f"Unable to load Haar cascade: {self.cascade_path}")
+
+    def detect(self, frame):
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        rects, _, weights = self.cascade.detectMultiScale3(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=self.min_size, outputRejectLevels=True)
+        if len(rects) == 0:
+            return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
+        rects = np.asarray(rects, dtype=np.int32).reshape(-1, 4)
+        boxes = np.column_stack((rects[:, :2], rects[:, :2] + rects[:, 2:]))
+        return boxes, np.asarray(weights, dtype=np.float32).reshape(-1)
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV's YuNet (cv2.FaceDetectorYN); also returns five landmarks per face."""
+
+    name = 'yunet'
+
+    def __init__(self, model_path=None, conf_threshold=0.6, nms_threshold=0.3, top_k=5000):
+        self.model_path = model_path or os.path.join(_MODELS_DIR, 'face_detection_yunet_2023mar.onnx')
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"YuNet model not found: {self.model_path}")
+        self.detector = cv2.FaceDetectorYN.create(self.model_path, "", (320, 320), conf_threshold,
+                                                  nms_threshold, top_k)
+        self._input_size = (320, 320)
+        self.last_faces = None
+
+    def detect(self, frame):
+        (h, w) = frame.shape[:2]
+        if self._input_size != (w, h):
+            self.detector.setInputSize((w, h))
+            self._input_size = (w, h)
+        _, faces = self.detector.detect(frame)
+        if faces is None:
+            self.last_faces = np.zeros((0, 15), dtype=np.float32)
+            return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
+        # Rows are x, y, w, h, five (x, y) landmarks, score
+        xywh = faces[:, :4]
+        boxes = np.column_stack((xywh[:, :2], xywh[:, :2] + xywh[:, 2:])).astype(np.int32)
+        np.clip(boxes[:, 0::2], 0, w, out=boxes[:, 0::2])
+        np.clip(boxes[:, 1::2], 0, h, out=boxes[:, 1::2])
+        valid = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+        self.last_faces = faces[valid]
+        return boxes[valid], faces[valid, 14].astype(np.float32)
+
+
+DETECTOR_BACKENDS = {
+    CaffeSSDDetector.name: CaffeSSDDetector,
+    HaarCascadeDetector.name: HaarCascadeDetector,
+    YuNetDetector.name: YuNetDetector,
+}
+
+
+def create_detector(backend='ssd', **kwargs):
+    """Build a detector backend by name: 'ssd', 'haar' or 'yunet'."""
+    try:
+        detector_cls = DETECTOR_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown face detector backend: {backend!r}") from None
+    return detector_cls(**kwargs)
@@ -1,12 +1,24 @@
-import json
+import copy
 import os
 import threading
 import time
+from collections import namedtuple
 
 import cv2
 import numpy as np
 from PyQt5.QtCore import QObject, pyqtSignal
 
+from FaceDetector import create_detector
+from FaceTracker import FaceTracker
+from FrameBuffers import FrameBufferPool, FrameScratch
+from FrameMailbox import FrameMailbox
+from FramePacer import FramePacer
+from IdentityCache import IdentityCache
+from InferenceProcessPool import InferenceProcessPool
+from MotionGate import MotionGate
+from RecognitionBackends import create_backend
+from UserRegistry import UserRegistry
+
 # Optional audio dependencies
 try:
     import pyaudio  # type: ignore
@@ -16,50 +28,156 @@ except Exception:
     _AUDIO_AVAILABLE = False
 
 
+# One recognised face of a frame; `identity` is the UserRegistry entry, None while unknown
+FaceRecord = namedtuple('FaceRecord', 'box identity distance')
+
+
+class CameraStream:
+    """Per-camera state: capture device, latest-frame mailbox, tracker and status."""
+
+    def __init__(self, index, source, detect_interval, ready_event=None):
+        self.index = index
+        self.source = source
+        self.cap = None
+        self.ready_event = ready_event
+        self.mailbox = FrameMailbox(ready_event, on_drop=self.release_frame)
+        # Preallocated capture buffers and per-frame work buffers, sized on the first frame
+        self.buffer_pool = None
+        self.scratch = None
+        self.capture_thread = None
+        self.tracker = FaceTracker()
+        self.motion_gate = MotionGate()
+        self.last_faces = []
+        # Stable per-face tracks so LBPH predict runs once per person, not once per frame
+        self.identity_cache = IdentityCache()
+        # FaceRecords of the latest frame, and the (track, label) pairs last published
+        self.face_records = []
+        self.published_faces = None
+        self.frames_since_detect = detect_interval
+        self.frame_index = 0
+        self.status = {
+            'light_status': "OFF",
+            'fan_status': "OFF",
+            'headcount': 0,
+            'dropped_frames': 0,
+            'motion_gate_hit_rate': 0.0,
+            'fps': 0.0,
+            'budget_utilization': 0.0
+        }
+
+    def release_frame(self, frame):
+        if self.buffer_pool is not None:
+            self.buffer_pool.release(frame)
+
+    def work_buffers(self, frame):
+        if self.scratch is None or not self.scratch.fits(frame):
+            self.scratch = FrameScratch(frame.shape)
+        return self.scratch
+
+
 class FaceRecognizer(QObject):
-    # Signals to communicate with UI thread
-    person_detected = pyqtSignal(dict)  # {name, roll_no, contact}
-    status_updated = pyqtSignal(dict)  # {light_status, fan_status, headcount}
+    # Signals to communicate with UI thread (first camera only)
+    faces_detected = pyqtSignal(list)  # [FaceRecord, ...], emitted when the people in view change
+    status_updated = pyqtSignal(dict)  # {light_status, fan_status, headcount, dropped_frames, motion_gate_hit_rate, fps, budget_utilization}
     frame_processed = pyqtSignal(object)  # Processed frame (for display)
+    # Per-camera signals, first argument is the camera index in `sources`
+    camera_faces_detected = pyqtSignal(int, list)
+    camera_status_updated = pyqtSignal(int, dict)
+    camera_frame_processed = pyqtSignal(int, object)
 
-    def __init__(self):
+    def __init__(self, sources=(0,), detect_interval=1, motion_gate=False, target_fps=30,
+                 max_detect_interval=15, detector='ssd', workers=0, recognizer='lbph'):
         super().__init__()
         self.running = False
+        # Skip detection entirely while the scene is static
+        self.use_motion_gate = motion_gate
+        # Run the SSD detector every `detect_interval` frames and track boxes in between
+        self.detect_interval = max(1, int(detect_interval))
+        # Pacing: sleep only what is left of each frame period; when over budget,
+        # detect less often (up to `max_detect_interval`) instead of falling behind
+        self.pacer = FramePacer(target_fps)
+        self.base_detect_interval = self.detect_interval
+        self.max_detect_interval = max(self.detect_interval, int(max_detect_interval))
+        self.detector_runs = 0
+        self.recognizer_runs = 0
+        # One stream per capture source (camera index or URL)
+        self._frame_ready = threading.Event()
+        self.streams = [CameraStream(i, src, self.detect_interval, self._frame_ready)
+                        for i, src in enumerate(sources)]
         # Resolve repo paths relative to this file so it works from any CWD
         self._repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         self._models_dir = os.path.join(self._repo_root, 'real-time-face-recognition')
-        self._trainer_path = os.path.join(self._repo_root, 'trainer.yml')
-        self._names_path = os.path.join(self._repo_root, 'names.json')
 
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
-        if os.path.exists(self._trainer_path):
-            self.recognizer.read(self._trainer_path)
-        else:
-            # Leave uninitialized; predictions will be skipped
-            self.recognizer = None  # type: ignore
-
-        self.net = cv2.dnn.readNetFromCaffe(
-            os.path.join(self._models_dir, 'deploy.prototxt'),
-            os.path.join(self._models_dir, 'res10_300x300_ssd_iter_140000.caffemodel')
-        )
-        self.users = self._load_users()
-        self.current_status = {
-            'light_status': "OFF",
-            'fan_status': "OFF",
-            'headcount': 0
-        }
+        # Recognition backend by name ('lbph', 'sface') or a ready RecognitionBackend
+        # (e.g. with its own index `nprobe`); every face of a frame is matched in one batch
+        self._recognizer_source = recognizer
+        self._recognizer_backend = recognizer if isinstance(recognizer, str) else recognizer.name
+        self.recognizer = self._load_recognizer()
+        # Recognizer loaded by reload_recognizer(), swapped in by the inference thread
+        self._pending_model = None
+        self._model_lock = threading.Lock()
+
+        # Detector backend by name ('ssd', 'haar', 'yunet') or a ready FaceDetector instance
+        self._detector_backend = detector if isinstance(detector, str) else getattr(detector, 'name', 'ssd')
+        if isinstance(detector, str):
+            detector = create_detector(detector, conf_threshold=0.6)
+        self.detector = detector
+        # Optionally run detection and recognition in `workers` separate processes
+        self.workers = workers
+        self.pool = None
+        # Registered people; the snapshot in `users` is reloaded whenever the
+        # registry's change counter moves, so new registrations show up live
+        self.registry = UserRegistry()
+        self._users_version = self.registry.version()
+        self.users = self.registry.users()
 
         # Start fan detection thread only if audio deps are available
         if _AUDIO_AVAILABLE:
             self.fan_thread = threading.Thread(target=self.detect_fan_status, daemon=True)
             self.fan_thread.start()
 
-    def _load_users(self):
-        try:
-            with open(self._names_path, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
+    @property
+    def current_status(self):
+        return self.streams[0].status
+
+    def _load_recognizer(self):
+        source = self._recognizer_source
+        # A fresh backend object, so the one in use is never modified while it is matching
+        recognizer = create_backend(source) if isinstance(source, str) else copy.copy(source)
+        if not recognizer.load():
+            # Nothing enrolled yet; predictions will be skipped
+            return None
+        return recognizer
+
+    def reload_recognizer(self):
+        """Load the model saved by a training run and switch the feed over to it.
+
+        The old model keeps recognising until the new one is loaded, which
+        can take a while for large galleries, so call this off the GUI
+        thread. Tracked faces are then re-identified with the new model.
+        """
+        recognizer = self._load_recognizer()
+        with self._model_lock:
+            self._pending_model = (recognizer,)
+        if self.pool is not None:
+            self.pool.reload_recognizer()
+
+    def _apply_pending_model(self):
+        # Inference thread only, between frames
+        with self._model_lock:
+            pending, self._pending_model = self._pending_model, None
+        if pending is not None:
+            (self.recognizer,) = pending
+            for camera in self.streams:
+                camera.identity_cache.clear()
+        self._refresh_users()
+
+    def _refresh_users(self):
+        # One indexed single-row read per frame; the full list only after a change
+        version = self.registry.version()
+        if version != self._users_version:
+            self._users_version = version
+            self.users = self.registry.users()
 
     def detect_fan_status(self, threshold=6000, smoothing_factor=5):
         if not _AUDIO_AVAILABLE:
@@ -90,9 +208,10 @@ class FaceRecognizer(QObject):
                 avg_amplitude = np.mean(recent_amplitudes)
 
                 new_status = "ON" if avg_amplitude > threshold else "OFF"
-                if new_status != self.current_status['fan_status']:
-                    self.current_status['fan_status'] = new_status
-                    self.status_updated.emit(self.current_status.copy())
+                for camera in self.streams:
+                    if new_status != camera.status['fan_status']:
+                        camera.status['fan_status'] = new_status
+                        self._emit_status(camera)
 
                 time.sleep(0.1)
         finally:
@@ -100,68 +219,282 @@ class FaceRecognizer(QObject):
             stream.close()
             p.terminate()
 
-    def process_frame(self, frame):
-        # Light detection
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        brightness = np.mean(gray)
-        light_status = "ON" if brightness > 80 else "OFF"
-
-        if light_status != self.current_status['light_status']:
-            self.current_status['light_status'] = light_status
-            self.status_updated.emit(self.current_status.copy())
-
-        # Face detection
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0))
-        self.net.setInput(blob)
-        detections = self.net.forward()
-
-        faces = []
-        current_person = {"name": "Unknown", "roll_no": "N/A", "contact": "N/A"}
-
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.6:
-                (h, w) = frame.shape[:2]
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-                faces.append((x, y, x1, y1))
-
-                # Face recognition
-                face_roi = gray[y:y1, x:x1]
-                # Only try recognition if a trained model is available
-                if self.recognizer is not None and face_roi.size > 0:
-                    try:
-                        face_roi_resized = cv2.resize(face_roi, (200, 200))
-                        id, confidence = self.recognizer.predict(face_roi_resized)
-                        if confidence < 50:
-                            current_person = self.users.get(str(id), {"name": "Unknown", "roll_no": "N/A", "contact": "N/A"})
-                    except Exception:
-                        pass
-
-                # Draw rectangle
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
+    def _emit_status(self, camera):
+        status = camera.status.copy()
+        self.camera_status_updated.emit(camera.index, status)
+        if camera.index == 0:
+            self.status_updated.emit(status)
 
-        # Update headcount
-        if len(faces) != self.current_status['headcount']:
-            self.current_status['headcount'] = len(faces)
-            self.status_updated.emit(self.current_status.copy())
+    def process_frame(self, frame, camera_index=0):
+        return self.process_frames({camera_index: frame})[camera_index]
+
+    def process_frames(self, frames):
+        """Process the latest frame of several cameras with one batched detector pass.
+
+        `frames` maps camera index to BGR frame; returns the annotated frames
+        under the same keys.
+        """
+        self._apply_pending_model()
+        prepared = {}
+        pending = []
+        for index, frame in frames.items():
+            camera = self.streams[index]
+            scratch = camera.work_buffers(frame)
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=scratch.gray)
+
+            # Light detection
+            brightness = cv2.mean(gray)[0]
+            light_status = "ON" if brightness > 80 else "OFF"
+            if light_status != camera.status['light_status']:
+                camera.status['light_status'] = light_status
+                self._emit_status(camera)
 
-        # Emit signals
-        self.person_detected.emit(current_person)
-        self.frame_processed.emit(frame)
+            # Static scene: reuse the previous boxes without tracking or detecting.
+            # Skipped frames still count toward the detection interval, so the
+            # gate's periodic refresh (and the first frame with motion) detects.
+            if self.use_motion_gate and not camera.motion_gate.should_detect(gray):
+                camera.frames_since_detect += 1
+                prepared[index] = (frame, gray, camera.last_faces)
+                continue
 
-        return frame
+            # Track between detections; cameras that are due go into the detector batch
+            faces = self._track_faces(camera, gray)
+            if faces is None:
+                pending.append(index)
+            prepared[index] = (frame, gray, faces)
+
+        if pending:
+            detected = self._detect_faces([frames[i] for i in pending])
+            for index, faces in zip(pending, detected):
+                camera = self.streams[index]
+                frame, gray, _ = prepared[index]
+                camera.frames_since_detect = 0
+                if self.detect_interval > 1:
+                    camera.tracker.reset(gray, faces)
+                prepared[index] = (frame, gray, faces)
+
+        for index, (frame, gray, faces) in prepared.items():
+            self.streams[index].last_faces = faces
+            self._recognize_faces(self.streams[index], frame, gray, faces)
+        return {index: prepared[index][0] for index in prepared}
+
+    def _track_faces(self, camera, gray):
+        """Tracked boxes for this frame, or None when the full detector has to run."""
+        camera.frames_since_detect += 1
+        if camera.frames_since_detect < self.detect_interval:
+            faces, ok = camera.tracker.update(gray)
+            if ok:
+                return faces
+        # Interval elapsed or the tracker lost a face
+        return None
+
+    def _detect_faces(self, frames):
+        # Batching backends run one forward pass for all cameras
+        results = self.detector.detect_batch(frames)
+        self.detector_runs += 1
+        return [[tuple(box) for box in boxes.tolist()] for boxes, _ in results]
+
+    def _recognize_faces(self, camera, frame, gray, faces, predictions=None):
+        camera.frame_index += 1
+        tracks = camera.identity_cache.update(faces, camera.frame_index)
+
+        # Predictions computed by worker processes only need to be cached
+        if predictions is not None:
+            for track, (label, distance) in zip(tracks, predictions):
+                if label is not None and camera.identity_cache.needs_prediction(track, camera.frame_index):
+                    camera.identity_cache.record(track, label, distance, camera.frame_index)
+        # Face recognition, only for tracks whose cached identity is due for a
+        # refresh, with every due face of the frame matched in one batch
+        elif self.recognizer is not None:
+            due = [track for track in tracks if camera.identity_cache.needs_prediction(track, camera.frame_index)]
+            if due:
+                predictions = self.recognizer.predict_boxes(frame, [track.box for track in due], gray)
+                for track, (id, confidence) in zip(due, predictions):
+                    camera.identity_cache.record(track, id, confidence, camera.frame_index)
+                self.recognizer_runs += len(due)
+
+        records = []
+        for track in tracks:
+            (x, y, x1, y1) = track.box
+            identity = self.users.get(str(track.label)) if track.label is not None else None
+            records.append(FaceRecord(track.box, identity, track.distance))
+
+            # Draw rectangle
+            cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
+        camera.face_records = records
+
+        # Update headcount
+        if len(faces) != camera.status['headcount']:
+            camera.status['headcount'] = len(faces)
+            self._emit_status(camera)
+
+        # Emit signals; the face list only when someone entered, left or was recognised
+        in_view = [(track.id, track.label) for track in tracks]
+        if in_view != camera.published_faces:
+            camera.published_faces = in_view
+            self.camera_faces_detected.emit(camera.index, records)
+            if camera.index == 0:
+                self.faces_detected.emit(records)
+        # The GUI paints queued frames whenever it gets to them, by which time a
+        # capture buffer may be written again; displays get a copy of their own.
+        # Pool results are private copies already
+        displays = self.receivers(self.camera_frame_processed)
+        if camera.index == 0:
+            displays += self.receivers(self.frame_processed)
+        if displays:
+            shown = frame if predictions is not None else frame.copy()
+            self.camera_frame_processed.emit(camera.index, shown)
+            if camera.index == 0:
+                self.frame_processed.emit(shown)
+        return records
 
     def start_processing(self):
+        # Each camera captures on its own thread and only ever hands over its
+        # newest frame, so a slow inference pass drops stale frames instead of
+        # letting them queue up in the driver buffer.
         self.running = True
-        self.cap = cv2.VideoCapture(0)
+        self.pacer.reset()
+        self.detect_interval = self.base_detect_interval
+        for camera in self.streams:
+            camera.identity_cache.clear()
+            camera.face_records = []
+            camera.published_faces = None
+            camera.motion_gate.reset()
+            camera.last_faces = []
+            camera.mailbox = FrameMailbox(self._frame_ready, on_drop=camera.release_frame)
+            camera.cap = cv2.VideoCapture(camera.source)
+            camera.capture_thread = threading.Thread(target=self._capture_loop, args=(camera,), daemon=True)
+            camera.capture_thread.start()
+        if self.workers > 0:
+            self._pool_inference_loop()
+        else:
+            self._inference_loop()
+
+    def _capture_loop(self, camera):
         while self.running:
-            ret, frame = self.cap.read()
-            if ret:
-                self.process_frame(frame)
-            time.sleep(0.03)  # ~30fps
+            # Read straight into a pooled buffer instead of allocating a new frame
+            buf = camera.buffer_pool.acquire() if camera.buffer_pool is not None else None
+            ret, frame = camera.cap.read(image=buf) if buf is not None else camera.cap.read()
+            if not ret:
+                camera.release_frame(buf)
+                time.sleep(0.01)
+                continue
+            if frame is not buf:
+                # First frame or a resolution change: size the pool to what the camera delivers
+                camera.release_frame(buf)
+                if camera.buffer_pool is None or camera.buffer_pool.shape != frame.shape:
+                    camera.buffer_pool = FrameBufferPool(frame.shape)
+            camera.mailbox.put(frame)
+
+    def _inference_loop(self):
+        last_report = time.monotonic()
+        while self.running:
+            self._frame_ready.wait(timeout=0.5)
+            self._frame_ready.clear()
+            # Gather whatever is newest from every camera into one batch
+            frames = {}
+            for camera in self.streams:
+                frame = camera.mailbox.get(timeout=0)
+                if frame is not None:
+                    frames[camera.index] = frame
+            if frames:
+                self.pacer.begin()
+                self.process_frames(frames)
+                self.pacer.end()
+                # The display got copies, so the capture buffers can be reused right away
+                for index, frame in frames.items():
+                    self.streams[index].release_frame(frame)
+
+            # Adapt the detection interval and publish frame statistics at most once per second
+            now = time.monotonic()
+            if now - last_report >= 1.0:
+                last_report = now
+                self._adapt_detect_interval()
+                self._report_frame_stats()
+
+    def _pool_inference_loop(self):
+        # Frames go to worker processes through shared memory; only boxes and
+        # predictions come back, so this thread just draws and publishes.
+        # Workers load the model themselves (and reload it after training), even if there is none yet
+        self.pool = InferenceProcessPool(self.workers, self._detector_backend, self._recognizer_backend)
+        last_report = time.monotonic()
+        try:
+            while self.running:
+                self._frame_ready.wait(timeout=0.005)
+                self._frame_ready.clear()
+                # Workers detect on every frame they get; while the interval is
+                # raised above its base, only every so many frames are sent
+                stride = self.detect_interval - self.base_detect_interval + 1
+                for camera in self.streams:
+                    frame = camera.mailbox.get(timeout=0)
+                    if frame is not None:
+                        camera.frames_since_detect += 1
+                        if camera.frames_since_detect >= stride:
+                            camera.frames_since_detect = 0
+                            # submit() copies into shared memory, so the capture buffer is free again
+                            self.pool.submit(camera.index, frame)
+                        camera.release_frame(frame)
+
+                for index, frame, boxes, predictions in self.pool.results(timeout=0.005):
+                    # The result rate is set by the workers; the pacer only measures this thread's share
+                    self.pacer.begin()
+                    self._publish_pool_result(self.streams[index], frame, boxes, predictions)
+                    self.pacer.end(sleep=False)
+
+                now = time.monotonic()
+                if now - last_report >= 1.0:
+                    last_report = now
+                    self._adapt_detect_interval()
+                    self._report_frame_stats()
+        finally:
+            self.pool.close()
+            self.pool = None
+
+    def _publish_pool_result(self, camera, frame, boxes, predictions):
+        self._apply_pending_model()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=camera.work_buffers(frame).gray)
+        light_status = "ON" if cv2.mean(gray)[0] > 80 else "OFF"
+        if light_status != camera.status['light_status']:
+            camera.status['light_status'] = light_status
+            self._emit_status(camera)
+        faces = [tuple(box) for box in boxes]
+        camera.last_faces = faces
+        self._recognize_faces(camera, frame, gray, faces, predictions)
+
+    def _adapt_detect_interval(self):
+        if self.pacer.over_budget and self.detect_interval < self.max_detect_interval:
+            self.detect_interval += 1
+        elif self.pacer.utilization < 0.6 and self.detect_interval > self.base_detect_interval:
+            self.detect_interval -= 1
+
+    def _report_frame_stats(self):
+        fps = round(self.pacer.fps, 1)
+        utilization = round(self.pacer.utilization, 2)
+        for camera in self.streams:
+            stats = {
+                'dropped_frames': camera.mailbox.stats()['dropped'] + self._pool_drops(camera),
+                'motion_gate_hit_rate': round(camera.motion_gate.hit_rate, 3),
+                'fps': fps,
+                'budget_utilization': utilization,
+            }
+            if any(camera.status[key] != value for key, value in stats.items()):
+                camera.status.update(stats)
+                self._emit_status(camera)
+
+    def _pool_drops(self, camera):
+        return self.pool.busy_drops.get(camera.index, 0) if self.pool is not None else 0
+
+    def frame_stats(self, camera_index=0):
+        """Captured / processed / dropped frame counts for the current session."""
+        return self.streams[camera_index].mailbox.stats()
 
     def stop_processing(self):
         self.running = False
-        if hasattr(self, 'cap'):
-            self.cap.release()
\ No newline at end of file
+        self._frame_ready.set()
+        for camera in self.streams:
+            camera.mailbox.close()
+            # Let the capture thread leave cap.read() before releasing the device
+            if camera.capture_thread is not None:
+                camera.capture_thread.join(timeout=1.0)
+            if camera.cap is not None:
+                camera.cap.release()
@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+
+class FaceTracker:
+    """Cheap optical-flow tracker that carries face boxes between detections.
+
+    `reset` seeds a handful of corner features inside each detected box and
+    `update` follows them with pyramidal Lucas-Kanade, shifting every box by
+    the median motion of its points. A box is considered lost when too few of
+    its points survive a forward-backward check, which tells the caller to run
+    the detector again. Moved boxes are clipped to the frame, and a box that
+    left it entirely is dropped.
+
+    The previous gray frame is copied into a buffer of the tracker's own,
+    since callers reuse their gray buffer for the next frame.
+    """
+
+    def __init__(self, max_corners=20, min_points=4, min_survival=0.5, max_fb_error=1.0):
+        self.max_corners = max_corners
+        self.max_fb_error = max_fb_error
+        self.min_points = min_points
+        self.min_survival = min_survival
+        self.lk_params = dict(winSize=(15, 15), maxLevel=2,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+        self.boxes = []
+        self._points = []
+        self._prev_gray = None
+
+    def _remember(self, gray):
+        if self._prev_gray is None or self._prev_gray.shape != gray.shape:
+            self._prev_gray = np.empty_like(gray)
+        np.copyto(self._prev_gray, gray)
+
+    def reset(self, gray, boxes):
+        self._remember(gray)
+        self.boxes = [tuple(int(v) for v in box) for box in boxes]
+        self._points = [self._seed_points(gray, box) for box in self.boxes]
+
+    def _seed_points(self, gray, box):
+        (h, w) = gray.shape[:2]
+        x, y, x1, y1 = box
+        x, y = max(x, 0), max(y, 0)
+        x1, y1 = min(x1, w), min(y1, h)
+        if x1 - x < 2 or y1 - y < 2:
+            return None
+        corners = cv2.goodFeaturesToTrack(gray[y:y1, x:x1], maxCorners=self.max_corners,
+                                          qualityLevel=0.01, minDistance=3)
+        if corners is None:
+            return None
+        corners += np.array([x, y], dtype=np.float32)
+        return corners
+
+    def update(self, gray):
+        """Advance all boxes to `gray`. Returns (boxes, ok); ok is False when any box was lost."""
+        if self._prev_gray is None:
+            return [], False
+        if not self.boxes:
+            self._remember(gray)
+            return [], True
+        if any(p is None or len(p) < self.min_points for p in self._points):
+            return list(self.boxes), False
+
+        # Track the points of every box in one LK call
+        counts = [len(p) for p in self._points]
+        prev_pts = np.concatenate(self._points).astype(np.float32)
+        next_pts, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, prev_pts, None, **self.lk_params)
+        # Forward-backward check: a point only counts if tracking it back lands where it started
+        back_pts, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._prev_gray, next_pts, None, **self.lk_params)
+        fb_error = np.linalg.norm((prev_pts - back_pts).reshape(-1, 2), axis=1)
+        status = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (fb_error < self.max_fb_error)
+
+        (h, w) = gray.shape[:2]
+        boxes, points, ok = [], [], True
+        start = 0
+        for box, count in zip(self.boxes, counts):
+            sl = slice(start, start + count)
+            start += count
+            good = status[sl]
+            if good.sum() < self.min_points or good.mean() < self.min_survival:
+                ok = False
+                boxes.append(box)
+                points.append(None)
+                continue
+            moved = next_pts[sl][good]
+            dx, dy = np.median((moved - prev_pts[sl][good]).reshape(-1, 2), axis=0)
+            # Clipped to the frame like detected boxes; a face that moved out is dropped
+            x, y, x1, y1 = (int(round(v)) for v in (box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy))
+            x, y, x1, y1 = max(x, 0), max(y, 0), min(x1, w), min(y1, h)
+            if x1 <= x or y1 <= y:
+                continue
+            boxes.append((x, y, x1, y1))
+            points.append(moved.reshape(-1, 1, 2))
+
+        self.boxes = boxes
+        self._points = points
+        self._remember(gray)
+        return list(boxes), ok
@@ -1,73 +1,264 @@
+import multiprocessing as mp
 import os
 import cv2
 import numpy as np
-from PIL import Image
+
+from CropCache import CropCache, detector_key
+from FaceDetector import CaffeSSDDetector, create_detector
+from RecognitionBackends import create_backend
+from SampleManifest import SampleManifest
+
+
+class TrainingCancelled(Exception):
+    """Raised inside `train`/`enroll` when `should_stop` asks for it, before the model is written."""
+
+
+# Below this many images to detect, starting worker processes costs more than it saves
+_PARALLEL_MIN_IMAGES = 64
+_CHUNK_IMAGES = 16
+
+
+def _build_detector(detector, proto_path, model_path):
+    if detector == 'ssd':
+        return CaffeSSDDetector(proto_path, model_path, conf_threshold=0.7)
+    if isinstance(detector, str):
+        return create_detector(detector, conf_threshold=0.7)
+    return detector
+
+
+def detect_faces(detector, image_path, grayscale=False):
+    """Face crops of one image file, converted to grayscale if asked."""
+    img_bgr = cv2.imread(image_path)
+    if img_bgr is None:
+        print(f"[WARNING] Unable to read image: {image_path}")
+        return []
+    boxes, _ = detector.detect(img_bgr)
+    crops = [img_bgr[y:y2, x:x2] for (x, y, x2, y2) in boxes if y2 > y and x2 > x]
+    if grayscale:
+        crops = [cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) for crop in crops]
+    return crops
+
+
+# Worker-process state, loaded once per worker
+_worker = {}
+
+
+def _worker_init(detector, proto_path, model_path, grayscale):
+    # One process per core already; OpenCV's own threads would only oversubscribe
+    cv2.setNumThreads(1)
+    _worker['detector'] = _build_detector(detector, proto_path, model_path)
+    _worker['grayscale'] = grayscale
+
+
+def _detect_chunk(chunk):
+    return [(i, detect_faces(_worker['detector'], path, _worker['grayscale'])) for i, path in chunk]
 
 
 class FaceTrainer:
     def __init__(self, images_path='./images/', proto_path=None,
-                 model_path=None, model_save_path=None):
+                 model_path=None, model_save_path=None, detector='ssd', recognizer='lbph',
+                 index_min_samples=2000, index_lists=None, index_probes=16, prototypes=None,
+                 compaction='kmeans', crop_cache=True, workers=None, progress=None, stage=None,
+                 should_stop=None, manifest_path=None):
         repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
         models_dir = os.path.join(repo_root, 'real-time-face-recognition')
         self.images_path = os.path.join(repo_root, images_path)
+        # Which images exist, per user (see SampleManifest); `manifest_path` is the SQLite database
+        self.manifest = SampleManifest(self.images_path, manifest_path)
         self.proto_path = proto_path or os.path.join(models_dir, 'deploy.prototxt')
         self.model_path = model_path or os.path.join(models_dir, 'res10_300x300_ssd_iter_140000.caffemodel')
-        # Save unified trainer to repo root for all components
-        self.model_save_path = model_save_path or os.path.join(repo_root, 'trainer.yml')
+        # Recognition backend by name or a ready one (e.g. LBPHBackend(storage='float32'));
+        # 'lbph' fits trainer.lbph, 'sface' only computes embeddings. Either way the
+        # gallery is saved to the repo root for all components
+        self.recognizer = (create_backend(recognizer, gallery_path=model_save_path)
+                           if isinstance(recognizer, str) else recognizer)
+        self.model_save_path = self.recognizer.gallery_path
+        # Galleries of at least `index_min_samples` faces get an IVF index next to the model
+        self.index_min_samples = index_min_samples
+        self.index_lists = index_lists
+        self.index_probes = index_probes
+        # Optionally keep only `prototypes` samples per identity ('medoids' or 'kmeans')
+        self.prototypes = prototypes
+        self.compaction = compaction
+
+        # Load face detector model; a named detector can also be rebuilt in worker processes
+        self.detector_backend = detector
+        detector = _build_detector(detector, self.proto_path, self.model_path)
+        self.detector = detector
+        # Processes decoding and detecting new images (default: one per core)
+        self.workers = workers or os.cpu_count() or 1
+        # Optional callbacks: progress(done, total) as images are processed,
+        # stage(description) as training moves on, and should_stop() -> True to
+        # cancel. Cancelling is possible until the new model starts being written
+        self.progress = progress
+        self.stage = stage
+        self.should_stop = should_stop
 
-        # Initialize face recognizer
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
+        # Face crops of already-seen images (see CropCache), kept in the form the
+        # backend trains on: grayscale for LBPH, BGR for SFace
+        self.crop_cache = None
+        if crop_cache:
+            kind = 'gray' if self.recognizer.grayscale else 'bgr'
+            self.crop_cache = CropCache(self.images_path, kind, detector_key(detector), manifest_path)
 
-        # Load face detector model
-        self.detector = cv2.dnn.readNetFromCaffe(self.proto_path, self.model_path)
+    def get_images_and_labels(self, ids=None):
+        """Face crops and IDs of the stored images, optionally only those of `ids`.
 
-    def get_images_and_labels(self):
+        The images come from the sample manifest, so other people's images
+        are never even listed. Only images that are new or changed since the
+        last run are decoded and run through the detector; the rest come
+        from the crop cache.
+        """
         if not os.path.exists(self.images_path):
             return [], []
-        image_paths = [os.path.join(self.images_path, f) for f in os.listdir(self.images_path)]
-        face_samples = []
-        ids = []
-
-        for image_path in image_paths:
-            PIL_img = Image.open(image_path).convert('RGB')
-            img_numpy = np.array(PIL_img, 'uint8')
-            img_bgr = cv2.cvtColor(img_numpy, cv2.COLOR_RGB2BGR)
-
-            # Extract the ID from the filename assuming format something like: user-<id>-something.jpg
-            try:
-                id = int(os.path.split(image_path)[-1].split("-")[1])
-            except (IndexError, ValueError) as e:
-                print(f"[WARNING] Skipping file with unexpected format: {image_path}")
-                continue
-
-            blob = cv2.dnn.blobFromImage(img_bgr, scalefactor=1.0, size=(300, 300), mean=(104.0, 177.0, 123.0))
-            self.detector.setInput(blob)
-            detections = self.detector.forward()
-
-            for i in range(detections.shape[2]):
-                confidence = detections[0, 0, i, 2]
-                if confidence > 0.7:
-                    box = detections[0, 0, i, 3:7] * np.array(
-                        [img_numpy.shape[1], img_numpy.shape[0], img_numpy.shape[1], img_numpy.shape[0]])
-                    (x, y, x2, y2) = box.astype("int")
-                    gray_face = cv2.cvtColor(img_bgr[y:y2, x:x2], cv2.COLOR_BGR2GRAY)
-                    face_samples.append(gray_face)
-                    ids.append(id)
-
-        return face_samples, ids
+        samples = self.manifest.samples(ids)
+        cache = self.crop_cache.load(sample.name for sample in samples) if self.crop_cache is not None else None
+        pending = []
+        per_image = []
+
+        for sample in samples:
+            crops = cache.get(sample.name, sample.mtime_ns, sample.size) if cache is not None else None
+            if crops is None:
+                pending.append((len(per_image), sample))
+            per_image.append((sample.user_id, crops))
+
+        # Results are put back in manifest order, so the samples do not depend on the worker count
+        image_paths = [os.path.join(self.images_path, sample.name) for _, sample in pending]
+        for (i, sample), crops in zip(pending, self._detect_all(image_paths)):
+            per_image[i] = (per_image[i][0], crops)
+            if cache is not None:
+                cache.put(sample.name, sample.mtime_ns, sample.size, crops)
+
+        face_samples = [crop for _, crops in per_image for crop in crops]
+        labels = [id for id, crops in per_image for _ in crops]
+        if cache is not None:
+            # Only a full listing says which images are gone
+            if ids is None:
+                cache.prune([sample.name for sample in samples])
+            cache.save()
+        print(f"[INFO] Face detection ran on {len(pending)} new or changed image(s), "
+              f"{len(face_samples)} face samples in total")
+        return face_samples, labels
+
+    def _detect_all(self, image_paths):
+        """Face crops of every image in `image_paths`, in order; on a process pool when worth it."""
+        total = len(image_paths)
+        results = [None] * total
+        grayscale = self.recognizer.grayscale
+        workers = min(self.workers, -(-total // _CHUNK_IMAGES))
+        if total < _PARALLEL_MIN_IMAGES:
+            workers = 1
+        elif workers > 1 and not isinstance(self.detector_backend, str):
+            print("[INFO] Custom detector instances cannot be sent to worker processes; detecting sequentially")
+            workers = 1
+
+        if workers <= 1:
+            for i, image_path in enumerate(image_paths):
+                results[i] = detect_faces(self.detector, image_path, grayscale)
+                self._report(i, i + 1, total)
+            return results
+
+        print(f"[INFO] Detecting faces in {total} images with {workers} worker processes")
+        indexed = list(enumerate(image_paths))
+        chunks = [indexed[start:start + _CHUNK_IMAGES] for start in range(0, total, _CHUNK_IMAGES)]
+        ctx = mp.get_context('spawn')
+        with ctx.Pool(workers, _worker_init,
+                      (self.detector_backend, self.proto_path, self.model_path, grayscale)) as pool:
+            done = 0
+            # Chunks come back as soon as any worker finishes one
+            for chunk in pool.imap_unordered(_detect_chunk, chunks):
+                for i, crops in chunk:
+                    results[i] = crops
+                done += len(chunk)
+                self._report(done - len(chunk), done, total)
+        return results
+
+    def _report(self, before, done, total):
+        self._check_cancelled()
+        if self.progress is not None:
+            self.progress(done, total)
+        # Roughly every tenth of the way
+        step = max(1, total // 10)
+        if done == total or done // step > before // step:
+            print(f"[INFO] Detecting faces: {done}/{total} images")
+
+    def _check_cancelled(self):
+        if self.should_stop is not None and self.should_stop():
+            raise TrainingCancelled()
+
+    def _enter_stage(self, description):
+        if self.stage is not None:
+            self.stage(description)
 
     def train(self):
+        """Train the model from every image; True once it has been saved."""
         print("\n[INFO] Training face recognizer...")
+        self._enter_stage("Detecting faces")
+        # A full retrain also picks up images copied in or deleted by hand
+        self.manifest.scan()
         faces, ids = self.get_images_and_labels()
         if not faces or not ids:
             print("[ERROR] No faces or IDs found for training.")
-            return
+            return False
 
+        self._check_cancelled()
+        self._enter_stage("Training model")
         self.recognizer.train(faces, np.array(ids))
-        self.recognizer.write(self.model_save_path)
         print(
             f"\n[INFO] Training complete. {len(np.unique(ids))} faces trained and model saved to {self.model_save_path}")
 
+        if self.prototypes:
+            self._enter_stage("Compacting gallery")
+            self.recognizer.compact(self.prototypes, self.compaction)
+            print(f"[INFO] Gallery compacted from {len(faces)} to {len(self.recognizer)} samples "
+                  f"({self.compaction}, up to {self.prototypes} per identity)")
+
+        if len(self.recognizer) >= self.index_min_samples:
+            self._enter_stage("Building index")
+            index = self.recognizer.build_index(self.index_lists, self.index_probes)
+            print(f"[INFO] Gallery index built: {index.nlist} lists, saved to {self.recognizer.index_path}")
+        else:
+            # Small galleries are scanned exactly; remove an index left from a larger one
+            self.recognizer.drop_index()
+        self.manifest.mark_trained()
+        return True
+
+    def enroll(self, ids):
+        """Add (or re-enroll) the people `ids` to the saved model without retraining everyone.
+
+        Only their images are read and detected, and only their samples are
+        added to the gallery, so the cost does not grow with the number of
+        people already enrolled. Falls back to `train` when there is no saved
+        model yet. Returns True once the model has been saved.
+        """
+        if not self.recognizer.load():
+            return self.train()
+
+        print(f"\n[INFO] Enrolling ID(s) {', '.join(str(id) for id in ids)}...")
+        self._enter_stage("Detecting faces")
+        # Images of an unknown ID were copied in by hand, not captured
+        if any(self.manifest.sample_count(id) == 0 for id in ids):
+            self.manifest.scan()
+        faces, labels = self.get_images_and_labels(ids)
+        if not faces:
+            print("[ERROR] No faces found for the new IDs.")
+            return False
+
+        self._check_cancelled()
+        self._enter_stage("Updating model")
+        self.recognizer.update(faces, np.array(labels), self.prototypes, self.compaction)
+        samples = len(self.recognizer)
+        print(f"[INFO] Enrollment complete. {len(faces)} samples added; model saved to {self.model_save_path}")
+
+        if samples < self.index_min_samples:
+            self.recognizer.drop_index()
+        elif not os.path.exists(self.recognizer.index_path):
+            self._enter_stage("Building index")
+            index = self.recognizer.build_index(self.index_lists, self.index_probes)
+            print(f"[INFO] Gallery index built: {index.nlist} lists, saved to {self.recognizer.index_path}")
+        self.manifest.mark_trained(ids)
+        return True
+
 
 if __name__ == "__main__":
     trainer = FaceTrainer()
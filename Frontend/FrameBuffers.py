@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+
+class FrameBufferPool:
+    """Fixed set of preallocated capture buffers sized to the camera resolution.
+
+    The capture thread reads straight into a free buffer with
+    `cap.read(image=buf)`. A buffer stays leased while it sits in the mailbox
+    and while it is being processed, and goes back to the pool through
+    `release`; the display is sent a copy. Four buffers cover one of each
+    plus the one currently being written, with one to spare.
+    """
+
+    def __init__(self, shape, count=4, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.buffers = [np.empty(self.shape, dtype=dtype) for _ in range(count)]
+        self._free = list(range(count))
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Lease a free buffer, or None if every buffer is in use."""
+        with self._lock:
+            if not self._free:
+                return None
+            return self.buffers[self._free.pop(0)]
+
+    def release(self, frame):
+        """Return a leased buffer; frames that do not belong to the pool are ignored."""
+        if frame is None:
+            return
+        with self._lock:
+            for i, buf in enumerate(self.buffers):
+                if buf is frame:
+                    if i not in self._free:
+                        self._free.append(i)
+                    return
+
+
+class FrameScratch:
+    """Per-camera work buffers reused by every frame of the live pipeline.
+
+    One gray buffer is enough: the tracker and the motion gate keep copies
+    of whatever they need from the previous frame.
+    """
+
+    def __init__(self, frame_shape):
+        self.frame_shape = tuple(frame_shape)
+        (h, w) = self.frame_shape[:2]
+        self.gray = np.empty((h, w), dtype=np.uint8)
+
+    def fits(self, frame):
+        return frame.shape == self.frame_shape
@@ -0,0 +1,66 @@
+import threading
+
+
+class FrameMailbox:
+    """One-slot mailbox between a capture thread and an inference thread.
+
+    The producer always overwrites the slot, so the consumer only ever sees the
+    newest frame. Frames that were overwritten before being taken are counted
+    as dropped instead of piling up behind a slow consumer. An optional
+    `ready_event` is set on every put so one consumer can wait on several
+    mailboxes at once, and `on_drop` is called with every overwritten frame
+    so its buffer can be recycled.
+    """
+
+    def __init__(self, ready_event=None, on_drop=None):
+        self._cond = threading.Condition()
+        self._ready_event = ready_event
+        self._on_drop = on_drop
+        self._frame = None
+        self._closed = False
+        self.put_count = 0
+        self.taken_count = 0
+        self.dropped_count = 0
+
+    def put(self, frame):
+        with self._cond:
+            dropped = self._frame
+            if dropped is not None:
+                self.dropped_count += 1
+            self._frame = frame
+            self.put_count += 1
+            self._cond.notify()
+        if dropped is not None and self._on_drop is not None:
+            self._on_drop(dropped)
+        if self._ready_event is not None:
+            self._ready_event.set()
+
+    def get(self, timeout=None):
+        """Take the newest frame, waiting up to `timeout` seconds for one.
+
+        Returns None on timeout or once the mailbox has been closed.
+        """
+        with self._cond:
+            if self._frame is None and not self._closed:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            if frame is not None:
+                self.taken_count += 1
+            return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        with self._cond:
+            return {
+                'captured': self.put_count,
+                'processed': self.taken_count,
+                'dropped': self.dropped_count,
+            }
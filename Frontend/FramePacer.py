@@ -0,0 +1,59 @@
+import time
+
+
+class FramePacer:
+    """Paces a processing loop to a target frame rate.
+
+    Call `begin` when an iteration starts and `end` when its work is done.
+    `end` sleeps only for what is left of the target period, and not at all
+    when the work overran it. Measured fps and budget utilization (processing
+    time / target period) are kept as exponential moving averages.
+    """
+
+    def __init__(self, target_fps=30.0, smoothing=0.1):
+        self.period = 1.0 / target_fps
+        self.smoothing = smoothing
+        self.fps = 0.0
+        self.utilization = 0.0
+        self.overruns = 0
+        self._start = None
+        self._last_start = None
+
+    def begin(self):
+        now = time.monotonic()
+        if self._last_start is not None:
+            interval = now - self._last_start
+            if interval > 0:
+                self.fps = self._ema(self.fps, 1.0 / interval)
+        self._last_start = now
+        self._start = now
+
+    def end(self, sleep=True):
+        """Finish an iteration, sleeping for the rest of the period. Returns the processing time.
+
+        With `sleep=False` the iteration is only measured, for loops whose
+        rate is set elsewhere.
+        """
+        elapsed = time.monotonic() - self._start
+        self.utilization = self._ema(self.utilization, elapsed / self.period)
+        remaining = self.period - elapsed
+        if remaining <= 0:
+            self.overruns += 1
+        elif sleep:
+            time.sleep(remaining)
+        return elapsed
+
+    @property
+    def over_budget(self):
+        return self.utilization > 1.0
+
+    def reset(self):
+        self.fps = 0.0
+        self.utilization = 0.0
+        self.overruns = 0
+        self._last_start = None
+
+    def _ema(self, current, sample):
+        if current == 0.0:
+            return sample
+        return current + self.smoothing * (sample - current)
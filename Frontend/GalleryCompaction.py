@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def medoids(distances, k, iterations=10):
+    """Indices of `k` medoids of a set, given its (n, n) distance matrix (k-medoids, PAM-style)."""
+    n = len(distances)
+    if n <= k:
+        return np.arange(n)
+
+    # Greedy build: start from the most central sample, then keep adding
+    # the sample that lowers the total distance to the nearest medoid most
+    chosen = [int(distances.sum(axis=1).argmin())]
+    nearest = distances[chosen[0]].copy()
+    while len(chosen) < k:
+        gain = np.maximum(nearest[None, :] - distances, 0.0).sum(axis=1)
+        gain[chosen] = -1.0
+        chosen.append(int(gain.argmax()))
+        nearest = np.minimum(nearest, distances[chosen[-1]])
+
+    chosen = np.array(chosen)
+    for _ in range(iterations):
+        assignment = distances[chosen].argmin(axis=0)
+        updated = chosen.copy()
+        for c in range(k):
+            members = np.flatnonzero(assignment == c)
+            if len(members):
+                within = distances[np.ix_(members, members)].sum(axis=1)
+                updated[c] = members[within.argmin()]
+        if np.array_equal(updated, chosen):
+            break
+        chosen = updated
+    return np.sort(chosen)
+
+
+def centroids(descriptors, distance, k, iterations=10, normalize=None):
+    """`k` k-means centroids of (n, D) descriptors under `distance`, seeded from the medoids."""
+    if len(descriptors) <= k:
+        return descriptors.copy()
+    centers = descriptors[medoids(distance(descriptors, descriptors), k)].copy()
+    for _ in range(iterations):
+        assignment = distance(descriptors, centers).argmin(axis=1)
+        for c in range(k):
+            members = assignment == c
+            if members.any():
+                centers[c] = descriptors[members].mean(axis=0)
+        if normalize is not None:
+            centers = normalize(centers)
+    return centers
+
+
+def compact(descriptors, labels, distance, prototypes=3, method='kmeans', normalize=None):
+    """Reduce every identity of a gallery to at most `prototypes` descriptors.
+
+    `distance(a, b)` returns the (len(a), len(b)) distance matrix of the
+    recognizer. 'medoids' keeps real enrolled samples; 'kmeans' replaces
+    them with cluster means (passed through `normalize`, if given). Returns
+    the compacted (descriptors, labels), identities in first-seen order.
+    """
+    if method not in ('medoids', 'kmeans'):
+        raise ValueError(f"Unknown compaction method: {method!r}")
+    kept, kept_labels = [], []
+    for label in dict.fromkeys(labels.tolist()):
+        samples = descriptors[labels == label]
+        if method == 'medoids':
+            reduced = samples[medoids(distance(samples, samples), prototypes)]
+        else:
+            reduced = centroids(samples, distance, prototypes, normalize=normalize)
+        kept.append(reduced)
+        kept_labels.append(np.full(len(reduced), label, dtype=labels.dtype))
+    if not kept:
+        return descriptors[:0], labels[:0]
+    return np.vstack(kept).astype(descriptors.dtype), np.concatenate(kept_labels)
@@ -0,0 +1,136 @@
+import os
+
+import cv2
+import numpy as np
+
+
+class IVFIndex:
+    """Inverted-file index over the stored face descriptors.
+
+    The gallery rows are clustered into `nlist` lists with k-means on coarse
+    vectors; a query is only compared exactly against the rows of its
+    `nprobe` nearest lists. Raising `nprobe` trades latency for recall, and
+    `nprobe >= nlist` is an exact search.
+
+    Coarse vectors are the descriptors themselves (SFace embeddings), or for
+    LBPH histograms their square roots, whose Euclidean distance tracks the
+    chi-square distance, reduced to a few dozen dimensions with PCA
+    (`mean` and `basis`).
+    """
+
+    def __init__(self, centroids, offsets, rows, nprobe=16, mean=None, basis=None):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.nprobe = int(nprobe)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32).reshape(1, -1)
+        self.basis = None if basis is None else np.ascontiguousarray(basis, dtype=np.float32)
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def encode(self, vectors, chunk_rows=1024):
+        """Coarse vectors of (N, D) descriptors."""
+        vectors = np.atleast_2d(vectors)
+        if self.basis is None:
+            return np.ascontiguousarray(vectors, dtype=np.float32)
+        out = np.empty((len(vectors), len(self.basis)), dtype=np.float32)
+        for start in range(0, len(vectors), chunk_rows):
+            block = np.sqrt(vectors[start:start + chunk_rows], dtype=np.float32)
+            block -= self.mean
+            np.matmul(block, self.basis.T, out=out[start:start + chunk_rows])
+        return out
+
+    @classmethod
+    def build(cls, vectors, nlist=None, nprobe=16, components=None, seed=0, iterations=20, pca_samples=1000):
+        """Cluster (N, D) descriptors into `nlist` lists (default ~4 * sqrt(N)).
+
+        With `components`, histograms are square-rooted and reduced to that
+        many PCA components, fitted on at most `pca_samples` random rows.
+        """
+        mean = basis = None
+        if components:
+            rng = np.random.default_rng(seed)
+            sample = rng.choice(len(vectors), min(pca_samples, len(vectors)), replace=False)
+            mean, basis = _pca(np.sqrt(vectors[np.sort(sample)], dtype=np.float32), components)
+        coarse = cls(np.zeros((0, 1)), [0], [], nprobe, mean, basis).encode(vectors)
+
+        nlist = int(nlist or max(1, round(4 * np.sqrt(len(coarse)))))
+        nlist = min(nlist, len(coarse))
+        cv2.setRNGSeed(seed)
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, iterations, 1e-4)
+        _, assignment, centroids = cv2.kmeans(coarse, nlist, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+        assignment = assignment.reshape(-1)
+        # Rows grouped by list, stable so each list keeps gallery order
+        rows = np.argsort(assignment, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist))))
+        return cls(centroids, offsets, rows, nprobe, mean, basis)
+
+    def probe(self, vectors, nprobe=None):
+        """Candidate gallery rows for each query descriptor, or None for an exact search."""
+        nprobe = nprobe or self.nprobe
+        if nprobe >= self.nlist:
+            return None
+        coarse = self.encode(vectors)
+        # Squared distances up to the per-query constant |q|^2
+        dist = self._centroid_norms[None, :] - 2.0 * coarse @ self.centroids.T
+        nearest = np.argpartition(dist, nprobe - 1, axis=1)[:, :nprobe]
+        candidates = []
+        for lists in nearest:
+            rows = np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+            # Ascending row order keeps `predict`'s first-minimum tie-break
+            candidates.append(np.sort(rows))
+        return candidates
+
+    def update(self, keep, vectors):
+        """Index of the gallery after dropping the rows where `keep` is False and appending `vectors`.
+
+        New rows join their nearest list; the lists are not re-clustered, so
+        a full retrain (which rebuilds the index) is still worth running now
+        and then.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        renumber = np.cumsum(keep) - 1
+        lists = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+        kept = keep[self.rows]
+        rows = np.concatenate((renumber[self.rows[kept]], np.arange(len(vectors)) + int(keep.sum())))
+        if len(vectors):
+            coarse = self.encode(vectors)
+            nearest = (self._centroid_norms[None, :] - 2.0 * coarse @ self.centroids.T).argmin(axis=1)
+        else:
+            nearest = np.zeros(0, dtype=np.int64)
+        lists = np.concatenate((lists[kept], nearest))
+        order = np.argsort(lists, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=self.nlist))))
+        return IVFIndex(self.centroids, offsets, rows[order], self.nprobe, self.mean, self.basis)
+
+    def save(self, path):
+        extra = {} if self.basis is None else {'mean': self.mean, 'basis': self.basis}
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, rows=self.rows, nprobe=self.nprobe, **extra)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['rows'], int(data['nprobe']),
+                       data['mean'] if 'mean' in data else None, data['basis'] if 'basis' in data else None)
+
+
+def _pca(samples, components):
+    """Mean and top principal axes of (n, D) samples with n << D, via the n x n Gram matrix."""
+    mean = samples.mean(axis=0, keepdims=True)
+    centered = samples - mean
+    eigenvalues, eigenvectors = np.linalg.eigh(centered @ centered.T)
+    top = np.ascontiguousarray(eigenvectors[:, ::-1][:, :min(components, len(samples))])
+    basis = top.T @ centered
+    basis /= np.maximum(np.linalg.norm(basis, axis=1, keepdims=True), 1e-12)
+    return mean, basis
+
+
+def index_path_for(gallery_path):
+    """Where the index of a gallery file is kept: trainer.lbph -> trainer.ivf.npz."""
+    return os.path.splitext(gallery_path)[0] + '.ivf.npz'
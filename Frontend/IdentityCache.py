@@ -0,0 +1,120 @@
+import itertools
+from collections import Counter, deque
+
+import numpy as np
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU between two (N, 4) / (M, 4) arrays of (x, y, x1, y1) boxes."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    ix = np.clip(np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0]), 0, None)
+    iy = np.clip(np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1]), 0, None)
+    inter = ix * iy
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class Track:
+    def __init__(self, track_id, box, frame_index, votes=5):
+        self.id = track_id
+        self.box = box
+        self.label = None  # Label the votes agreed on, None while unknown
+        self.distance = None
+        # Last `votes` predictions as (label or None if not confident, distance)
+        self.votes = deque(maxlen=votes)
+        self.last_seen = frame_index
+        self.last_predicted = None
+        self.reacquired = True  # New tracks always get a prediction
+
+
+class IdentityCache:
+    """Keeps stable track ids across frames and the identity each track was given.
+
+    Boxes are matched to existing tracks by overlap, so a person standing in
+    the same place keeps their id and label. `needs_prediction` tells the
+    caller when a track is due for another recognizer call: when it is new or
+    re-acquired, when it has no agreed label yet or its latest prediction
+    disagreed with it (throttled to `retry_interval` frames), or when its
+    label is older than `refresh_interval` frames.
+
+    A track's label is a vote over its last `votes` predictions: a label is
+    committed once `quorum` of them named it with a distance under
+    `accept_distance`, and dropped again when fewer than `quorum - 1` still
+    do or another label reaches the quorum. A single stray prediction
+    therefore neither flips a label nor clears it.
+    """
+
+    def __init__(self, iou_threshold=0.3, accept_distance=50, refresh_interval=30,
+                 retry_interval=5, max_missed=10, votes=5, quorum=3):
+        self.iou_threshold = iou_threshold
+        self.accept_distance = accept_distance
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.max_missed = max_missed
+        self.votes = votes
+        self.quorum = quorum
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, frame_index):
+        """Assign `boxes` to tracks and return the tracks visible in this frame, in box order."""
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        assigned = [None] * len(boxes)
+
+        if boxes and self.tracks:
+            iou = box_iou(boxes, [t.box for t in self.tracks])
+            # Greedy matching, best overlaps first
+            for flat in np.argsort(-iou, axis=None):
+                bi, ti = np.unravel_index(flat, iou.shape)
+                if iou[bi, ti] < self.iou_threshold:
+                    break
+                track = self.tracks[ti]
+                if assigned[bi] is not None or track.last_seen == frame_index:
+                    continue
+                # A track that vanished for a while is treated as re-acquired
+                track.reacquired = track.reacquired or frame_index - track.last_seen > 1
+                track.box = boxes[bi]
+                track.last_seen = frame_index
+                assigned[bi] = track
+
+        for bi, box in enumerate(boxes):
+            if assigned[bi] is None:
+                track = Track(next(self._ids), box, frame_index, self.votes)
+                self.tracks.append(track)
+                assigned[bi] = track
+
+        # Forget tracks that have not been seen for a while
+        self.tracks = [t for t in self.tracks if frame_index - t.last_seen <= self.max_missed]
+        return assigned
+
+    def needs_prediction(self, track, frame_index):
+        if track.reacquired or track.last_predicted is None:
+            return True
+        since = frame_index - track.last_predicted
+        if track.label is None or track.votes[-1][0] != track.label:
+            return since >= self.retry_interval
+        return since >= self.refresh_interval
+
+    def record(self, track, label, distance, frame_index):
+        """Add a recognizer result to the track's votes and re-decide its label."""
+        track.last_predicted = frame_index
+        track.reacquired = False
+        track.votes.append((label if distance < self.accept_distance else None, distance))
+
+        counts = Counter(vote for vote, _ in track.votes if vote is not None)
+        winner, count = counts.most_common(1)[0] if counts else (None, 0)
+        if count >= self.quorum and counts[track.label] < count:
+            track.label = winner
+        elif track.label is not None and counts[track.label] < self.quorum - 1:
+            # Hysteresis: a committed label survives one dissenting vote
+            track.label = None
+        if track.label is not None:
+            track.distance = min(d for vote, d in track.votes if vote == track.label)
+        else:
+            track.distance = distance
+
+    def clear(self):
+        self.tracks = []
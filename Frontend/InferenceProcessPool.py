@@ -0,0 +1,190 @@
+import multiprocessing as mp
+import queue
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from FaceDetector import create_detector
+from RecognitionBackends import create_backend
+
+
+class SharedFrameRing:
+    """Fixed-size ring of frame slots in one shared-memory block.
+
+    The owning process copies a frame into a free slot and hands only the slot
+    number to a worker; the slot stays reserved until the worker's result has
+    been collected, so frames never have to be pickled.
+    """
+
+    def __init__(self, shape, slots=4, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        size = int(np.prod(self.shape)) * self.dtype.itemsize * slots
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def acquire(self):
+        """Reserve a free slot, or None when every slot is still in flight."""
+        with self._lock:
+            return self._free.pop(0) if self._free else None
+
+    def release(self, slot):
+        with self._lock:
+            self._free.append(slot)
+
+    def write(self, slot, frame):
+        np.copyto(self.frames[slot], frame)
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Worker-process state, loaded once per worker
+_attached = {}
+
+
+def _attach(name, shape, slots):
+    """Map a ring created by the parent process into this worker."""
+    if name not in _attached:
+        # Spawned workers share the parent's resource tracker, so the block is
+        # still unlinked exactly once, by the parent in SharedFrameRing.close()
+        shm = shared_memory.SharedMemory(name=name)
+        frames = np.ndarray((slots,) + tuple(shape), dtype=np.uint8, buffer=shm.buf)
+        _attached[name] = (shm, frames)
+    return _attached[name][1]
+
+
+def _load_recognizer(recognizer_backend):
+    if not recognizer_backend:
+        return None
+    recognizer = create_backend(recognizer_backend)
+    return recognizer if recognizer.load() else None
+
+
+def _worker_main(tasks, results, detector_backend, recognizer_backend):
+    detector = create_detector(detector_backend, conf_threshold=0.6)
+    recognizer = _load_recognizer(recognizer_backend)
+    loaded_generation = 0
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        camera_index, seq, name, slots, shape, slot, generation = task
+        if generation != loaded_generation:
+            # A new model was saved since this worker loaded its copy
+            recognizer = _load_recognizer(recognizer_backend)
+            loaded_generation = generation
+        frame = _attach(name, shape, slots)[slot]
+
+        boxes, _ = detector.detect(frame)
+        predictions = []
+        if recognizer is not None and len(boxes):
+            # One batched gallery match for every face in the frame
+            predictions = recognizer.predict_boxes(frame, boxes.tolist())
+        else:
+            predictions = [(None, None)] * len(boxes)
+
+        # Only the small result record travels back to the UI process
+        results.put((camera_index, seq, name, slot, boxes.tolist(), predictions))
+
+    for shm, _ in _attached.values():
+        shm.close()
+
+
+class InferenceProcessPool:
+    """Runs detection and face recognition in worker processes.
+
+    Frames go to the workers through one SharedFrameRing per camera and only
+    `(boxes, predictions)` records come back, so the pipeline can use every
+    core instead of competing with the Qt and audio threads for the GIL.
+    """
+
+    def __init__(self, workers=2, detector='ssd', recognizer=None, slots_per_camera=None):
+        self.workers = workers
+        self.slots_per_camera = slots_per_camera or workers + 1
+        ctx = mp.get_context('spawn')
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._rings = {}  # camera index -> current ring
+        self._rings_by_name = {}
+        self._seq = {}
+        self._latest = {}
+        self.busy_drops = {}  # camera index -> frames dropped because every slot was in flight
+        # Bumped by reload_recognizer(); workers reload the model when a task carries a new one
+        self.model_generation = 0
+        self._processes = [
+            ctx.Process(target=_worker_main, daemon=True,
+                        args=(self._tasks, self._results, detector, recognizer))
+            for _ in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+
+    def submit(self, camera_index, frame):
+        """Queue a frame; returns False when all of the camera's slots are busy."""
+        ring = self._rings.get(camera_index)
+        if ring is None or ring.shape != frame.shape:
+            # First frame or a resolution change; a replaced ring is only freed on close()
+            ring = SharedFrameRing(frame.shape, self.slots_per_camera)
+            self._rings[camera_index] = ring
+            self._rings_by_name[ring.name] = ring
+
+        slot = ring.acquire()
+        if slot is None:
+            self.busy_drops[camera_index] = self.busy_drops.get(camera_index, 0) + 1
+            return False
+        ring.write(slot, frame)
+        seq = self._seq.get(camera_index, 0) + 1
+        self._seq[camera_index] = seq
+        self._tasks.put((camera_index, seq, ring.name, ring.slots, ring.shape, slot, self.model_generation))
+        return True
+
+    def reload_recognizer(self):
+        """Have every worker load the newly saved model before its next frame."""
+        self.model_generation += 1
+
+    def results(self, timeout=0.0):
+        """Collect finished frames as (camera_index, frame, boxes, predictions) records.
+
+        Waits up to `timeout` seconds for the first result. Results that
+        arrive after a newer frame of the same camera are dropped.
+        """
+        collected = []
+        while True:
+            try:
+                item = self._results.get(timeout=timeout) if not collected else self._results.get_nowait()
+            except queue.Empty:
+                break
+            camera_index, seq, name, slot, boxes, predictions = item
+            ring = self._rings_by_name[name]
+            if seq <= self._latest.get(camera_index, 0):
+                ring.release(slot)
+                continue
+            self._latest[camera_index] = seq
+            frame = ring.frames[slot].copy()
+            ring.release(slot)
+            collected.append((camera_index, frame, boxes, predictions))
+        return collected
+
+    def close(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        for ring in self._rings_by_name.values():
+            ring.close()
+        self._rings = {}
+        self._rings_by_name = {}
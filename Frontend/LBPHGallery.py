@@ -0,0 +1,490 @@
+import math
+import os
+
+import cv2
+import numpy as np
+
+_FLT_EPSILON = np.finfo(np.float32).eps
+
+# In-memory (and on-disk) storages of the histogram matrix, see quantize_histograms
+STORAGES = ('float32', 'float16', 'uint8')
+
+# Binary model layout (all little-endian): this 128-byte header, then the
+# int32 labels, the float64 histogram row sums, the float32 per-row scales
+# (uint8 storage only) and the (rows, dims) histogram matrix in its storage,
+# each starting on a 64-byte boundary at the stored offset. Version 1 files
+# (float32 only) end the header after `histograms_offset`.
+LBPH_MAGIC = b'LBPHFACE'
+LBPH_VERSION = 2
+_HEADER = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('radius', '<i4'), ('neighbors', '<i4'),
+    ('grid_x', '<i4'), ('grid_y', '<i4'), ('threshold', '<f8'), ('rows', '<u8'), ('dims', '<u8'),
+    ('labels_offset', '<u8'), ('sums_offset', '<u8'), ('histograms_offset', '<u8'),
+    ('storage', '<u4'), ('scales_offset', '<u8'),
+])
+_HEADER_SIZE = 128
+_ALIGN = 64
+_STORAGE_DTYPES = {'float32': '<f4', 'float16': '<f2', 'uint8': 'u1'}
+
+
+class LBPHModel:
+    """Parameters, labels and stored histograms of a trained LBPH recognizer.
+
+    The histograms are kept in `codes`, in one of the STORAGES: float32 as
+    OpenCV computes them, float16, or uint8 counts that are multiplied by a
+    per-row `scales` factor. `histograms` is always the float32 matrix;
+    LBPHGallery matches on `codes` directly.
+    """
+
+    def __init__(self, histograms, labels, radius=1, neighbors=8, grid_x=8, grid_y=8,
+                 threshold=float(np.finfo(np.float64).max), row_sums=None, scales=None):
+        histograms = np.asarray(histograms)
+        dtype = histograms.dtype if histograms.dtype in (np.float16, np.uint8) else np.float32
+        self.codes = np.ascontiguousarray(histograms, dtype=dtype)
+        if (scales is None) != (dtype != np.uint8):
+            raise ValueError("uint8 histograms need per-row scales, and only they do")
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32).reshape(-1)
+        self.labels = np.asarray(labels, dtype=np.int32).reshape(-1)
+        self.radius = int(radius)
+        self.neighbors = int(neighbors)
+        self.grid_x = int(grid_x)
+        self.grid_y = int(grid_y)
+        self.threshold = float(threshold)
+        # Per-row histogram sums, when stored with the model (binary format)
+        self.row_sums = row_sums
+
+    @property
+    def num_patterns(self):
+        return 2 ** self.neighbors
+
+    @property
+    def storage(self):
+        return self.codes.dtype.name
+
+    @property
+    def histograms(self):
+        return self.dense()
+
+    def dense(self, rows=slice(None)):
+        """float32 histograms of `rows` (all of them by default)."""
+        codes = self.codes[rows]
+        if self.scales is not None:
+            return codes.astype(np.float32) * self.scales[rows][..., None]
+        return codes if codes.dtype == np.float32 else codes.astype(np.float32)
+
+    def histogram_sums(self, chunk_rows=64):
+        """float64 sum of every histogram row, as LBPHGallery's distance needs them."""
+        if self.row_sums is not None:
+            return np.asarray(self.row_sums, dtype=np.float64)
+        # Summed over the float32 values, as for a float32 gallery, a few MB at a time
+        sums = np.empty(len(self.codes), dtype=np.float64)
+        for start in range(0, len(self.codes), chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            sums[rows] = self.dense(rows).sum(axis=1, dtype=np.float64)
+        return sums
+
+    def with_rows(self, keep, histograms, labels):
+        """This model with only the rows where `keep` is True, plus float32 `histograms` of `labels`.
+
+        The kept rows stay as they are stored (and keep their row sums); only
+        the new ones are converted.
+        """
+        keep = np.asarray(keep, dtype=bool)
+        kept = int(keep.sum())
+        new_codes, new_scales = quantize_histograms(histograms, self.storage)
+        # Filled in place, so the kept rows are copied once
+        codes = np.empty((kept + len(new_codes), self.codes.shape[1]), dtype=self.codes.dtype)
+        # mode='clip' writes straight into `out` (the default 'raise' buffers a full copy)
+        np.take(self.codes, np.flatnonzero(keep), axis=0, out=codes[:kept], mode='clip')
+        codes[kept:] = new_codes
+        scales = None if new_scales is None else np.concatenate((self.scales[keep], new_scales))
+        model = LBPHModel(codes, np.concatenate((self.labels[keep], labels)), self.radius, self.neighbors,
+                          self.grid_x, self.grid_y, self.threshold, scales=scales)
+        new_sums = LBPHModel(new_codes, labels, scales=new_scales).histogram_sums()
+        model.row_sums = np.concatenate((self.histogram_sums()[keep], new_sums))
+        return model
+
+    def quantized(self, storage):
+        """This model with its histograms in `storage` (itself when already stored that way)."""
+        if storage == self.storage:
+            return self
+        codes, scales = quantize_histograms(self.codes if self.scales is None else self.histograms, storage)
+        return LBPHModel(codes, self.labels, self.radius, self.neighbors, self.grid_x, self.grid_y,
+                         self.threshold, scales=scales)
+
+
+def quantize_histograms(histograms, storage, chunk_rows=1024):
+    """(codes, scales) of float32 (N, D) histograms in `storage`; scales is None unless 'uint8'.
+
+    Raw LBPH bins are pixel counts times 1 / (cell area), so for uint8 the
+    smallest non-zero bin of a row recovers that factor and the counts are
+    stored exactly, as long as none exceeds 255. Other rows (cells larger
+    than 255 pixels dominated by one pattern, or compacted means) keep 255
+    levels of their largest bin.
+    """
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown histogram storage: {storage!r}")
+    if storage == 'float32':
+        return np.ascontiguousarray(histograms, dtype=np.float32), None
+    if storage == 'float16':
+        return np.asarray(histograms).astype(np.float16), None
+
+    codes = np.empty(np.shape(histograms), dtype=np.uint8)
+    scales = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), chunk_rows):
+        block = np.asarray(histograms[start:start + chunk_rows], dtype=np.float32)
+        unit = np.where(block > 0, block, np.inf).min(axis=1, initial=np.inf)
+        unit[~np.isfinite(unit)] = 1.0
+        counts = np.rint(block / unit[:, None])
+        exact = (counts.max(axis=1, initial=0) <= 255) & (counts * unit[:, None] == block).all(axis=1)
+        if not exact.all():
+            top = block[~exact].max(axis=1, initial=0)
+            unit[~exact] = np.where(top > 0, top / np.float32(255), np.float32(1))
+            counts[~exact] = np.rint(block[~exact] / unit[~exact, None])
+        codes[start:start + chunk_rows] = np.clip(counts, 0, 255)
+        scales[start:start + chunk_rows] = unit
+    return codes, scales
+
+
+def read_lbph_model(path):
+    """Read the `opencv_lbphfaces` node written by `LBPHFaceRecognizer.write`."""
+    fs = cv2.FileStorage(path, cv2.FILE_STORAGE_READ)
+    if not fs.isOpened():
+        raise FileNotFoundError(f"Unable to open LBPH model: {path}")
+    try:
+        node = fs.getNode('opencv_lbphfaces')
+        hist_node = node.getNode('histograms')
+        histograms = [hist_node.at(i).mat().reshape(-1) for i in range(hist_node.size())]
+        labels = node.getNode('labels').mat()
+        dims = len(histograms[0]) if histograms else 0
+        return LBPHModel(
+            np.vstack(histograms) if histograms else np.zeros((0, dims), dtype=np.float32),
+            labels.reshape(-1) if labels is not None else np.zeros(0, dtype=np.int32),
+            radius=node.getNode('radius').real(),
+            neighbors=node.getNode('neighbors').real(),
+            grid_x=node.getNode('grid_x').real(),
+            grid_y=node.getNode('grid_y').real(),
+            threshold=node.getNode('threshold').real(),
+        )
+    finally:
+        fs.release()
+
+
+def write_lbph_model(model, path):
+    """Write `model` in the `opencv_lbphfaces` format, readable by `LBPHFaceRecognizer.read`."""
+    fs = cv2.FileStorage(path, cv2.FILE_STORAGE_WRITE)
+    if not fs.isOpened():
+        raise OSError(f"Unable to write LBPH model: {path}")
+    try:
+        fs.startWriteStruct('opencv_lbphfaces', cv2.FileNode_MAP)
+        fs.write('threshold', model.threshold)
+        fs.write('radius', model.radius)
+        fs.write('neighbors', model.neighbors)
+        fs.write('grid_x', model.grid_x)
+        fs.write('grid_y', model.grid_y)
+        fs.startWriteStruct('histograms', cv2.FileNode_SEQ)
+        for histogram in model.histograms:
+            fs.write('', histogram.reshape(1, -1))
+        fs.endWriteStruct()
+        fs.write('labels', model.labels.reshape(-1, 1))
+        fs.startWriteStruct('labelsInfo', cv2.FileNode_SEQ)
+        fs.endWriteStruct()
+        fs.endWriteStruct()
+    finally:
+        fs.release()
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def write_lbph_binary(model, path):
+    """Write `model`, in its storage, in the binary layout `read_lbph_binary` maps back without parsing."""
+    codes, labels = model.codes, model.labels
+    row_sums = model.histogram_sums()
+    scales = model.scales if model.scales is not None else np.zeros(0, dtype=np.float32)
+    labels_offset = _HEADER_SIZE
+    sums_offset = _aligned(labels_offset + labels.nbytes)
+    scales_offset = _aligned(sums_offset + row_sums.nbytes)
+    histograms_offset = _aligned(scales_offset + scales.nbytes)
+    header = np.zeros((), dtype=_HEADER)
+    header['magic'] = LBPH_MAGIC
+    header['version'] = LBPH_VERSION
+    for name in ('radius', 'neighbors', 'grid_x', 'grid_y', 'threshold'):
+        header[name] = getattr(model, name)
+    header['rows'], header['dims'] = codes.shape
+    header['labels_offset'] = labels_offset
+    header['sums_offset'] = sums_offset
+    header['histograms_offset'] = histograms_offset
+    header['storage'] = STORAGES.index(model.storage)
+    header['scales_offset'] = scales_offset if model.scales is not None else 0
+    with open(path, 'wb') as f:
+        for offset, data, dtype in ((0, header, _HEADER), (labels_offset, labels, '<i4'),
+                                    (sums_offset, row_sums, '<f8'), (scales_offset, scales, '<f4'),
+                                    (histograms_offset, codes, _STORAGE_DTYPES[model.storage])):
+            f.write(b'\0' * (offset - f.tell()))
+            # Written from the array's own memory; only converted when the dtype differs
+            f.write(np.ascontiguousarray(data, dtype=dtype).data)
+
+
+def read_lbph_binary(path, mmap=None):
+    """Read a model written by `write_lbph_binary`.
+
+    With `mmap` (default: everywhere but Windows, where a mapped file could
+    not be replaced by the next training run) the histogram matrix is
+    memory-mapped read-only: loading costs a few page faults instead of a
+    full read, and processes sharing the file share its pages.
+    """
+    if mmap is None:
+        mmap = os.name != 'nt'
+    header = np.fromfile(path, dtype=_HEADER, count=1)
+    if len(header) != 1 or header['magic'][0] != LBPH_MAGIC:
+        raise ValueError(f"Not a binary LBPH model: {path}")
+    header = header[0]
+    if header['version'] not in (1, LBPH_VERSION):
+        raise ValueError(f"Unsupported LBPH model version {header['version']}: {path}")
+    rows, dims = int(header['rows']), int(header['dims'])
+    # Version 1 headers are zero-padded past `histograms_offset`: float32, no scales
+    storage = STORAGES[int(header['storage'])] if header['version'] > 1 else 'float32'
+
+    def section(dtype, offset, shape):
+        if mmap and np.prod(shape):
+            return np.memmap(path, dtype=dtype, mode='r', offset=int(offset), shape=shape)
+        count = int(np.prod(shape))
+        return np.fromfile(path, dtype=dtype, count=count, offset=int(offset)).reshape(shape)
+
+    return LBPHModel(
+        section(_STORAGE_DTYPES[storage], header['histograms_offset'], (rows, dims)),
+        section('<i4', header['labels_offset'], (rows,)),
+        radius=header['radius'], neighbors=header['neighbors'],
+        grid_x=header['grid_x'], grid_y=header['grid_y'], threshold=header['threshold'],
+        row_sums=section('<f8', header['sums_offset'], (rows,)),
+        scales=section('<f4', header['scales_offset'], (rows,)) if storage == 'uint8' else None,
+    )
+
+
+def is_lbph_binary(path):
+    with open(path, 'rb') as f:
+        return f.read(len(LBPH_MAGIC)) == LBPH_MAGIC
+
+
+def load_lbph_model(path):
+    """Read an LBPH model in either format: binary, or OpenCV's YAML/XML (`trainer.yml`)."""
+    return read_lbph_binary(path) if is_lbph_binary(path) else read_lbph_model(path)
+
+
+def is_opencv_model_path(path):
+    return os.path.splitext(path)[1].lower() in ('.yml', '.yaml', '.xml')
+
+
+def save_lbph_model(model, path):
+    """Write `model` in the format its file name asks for: OpenCV's for .yml/.yaml/.xml, else binary."""
+    if is_opencv_model_path(path):
+        write_lbph_model(model, path)
+    else:
+        write_lbph_binary(model, path)
+
+
+def lbp_codes(gray, radius=1, neighbors=8):
+    """Extended (circular) LBP codes, computed exactly like OpenCV's LBPH `elbp`.
+
+    Returns an int32 image that is `2 * radius` smaller than `gray` in both
+    dimensions.
+    """
+    src = np.asarray(gray, dtype=np.float32)
+    (h, w) = src.shape
+    r = radius
+    center = src[r:h - r, r:w - r]
+    codes = np.zeros(center.shape, dtype=np.int32)
+    t = np.empty(center.shape, dtype=np.float32)
+    term = np.empty(center.shape, dtype=np.float32)
+    bit = np.empty(center.shape, dtype=bool)
+    one = np.float32(1.0)
+    for n in range(neighbors):
+        # Sample point and bilinear weights, with OpenCV's double -> float roundings
+        x = np.float32(radius * math.cos(2.0 * math.pi * n / float(neighbors)))
+        y = np.float32(-radius * math.sin(2.0 * math.pi * n / float(neighbors)))
+        fx, fy = int(math.floor(x)), int(math.floor(y))
+        cx, cy = int(math.ceil(x)), int(math.ceil(y))
+        ty = np.float32(y - np.float32(fy))
+        tx = np.float32(x - np.float32(fx))
+        weights = ((one - tx) * (one - ty), tx * (one - ty), (one - tx) * ty, tx * ty)
+        corners = ((fy, fx), (fy, cx), (cy, fx), (cy, cx))
+
+        # t = w1 * a + w2 * b + w3 * c + w4 * d, summed in the same order as
+        # OpenCV; zero-weight corners add nothing and are skipped
+        t.fill(0)
+        for weight, (dy, dx) in zip(weights, corners):
+            if weight == 0:
+                continue
+            np.multiply(src[r + dy:h - r + dy, r + dx:w - r + dx], weight, out=term)
+            np.add(t, term, out=t)
+        np.greater(t, center, out=bit)
+        np.subtract(t, center, out=term)
+        np.abs(term, out=term)
+        bit |= term < _FLT_EPSILON
+        codes |= bit.astype(np.int32) << n
+    return codes
+
+
+def spatial_histogram(codes, num_patterns=256, grid_x=8, grid_y=8):
+    """Concatenated, per-cell normalised LBP histograms, as LBPH `spatial_histogram` builds them."""
+    (rows, cols) = codes.shape
+    width, height = cols // grid_x, rows // grid_y
+    result = np.zeros((grid_x * grid_y, num_patterns), dtype=np.float32)
+    if width == 0 or height == 0:
+        return result.reshape(-1)
+
+    # Cell (i, j) covers rows i*height:(i+1)*height and cols j*width:(j+1)*width
+    cells = codes[:grid_y * height, :grid_x * width].reshape(grid_y, height, grid_x, width)
+    cells = cells.transpose(0, 2, 1, 3).reshape(grid_x * grid_y, height * width)
+    offsets = (np.arange(grid_x * grid_y) * num_patterns)[:, None]
+    counts = np.bincount((cells + offsets).ravel(), minlength=grid_x * grid_y * num_patterns)
+    scale = np.float32(1.0 / (height * width))
+    return (counts.astype(np.float32) * scale).astype(np.float32)
+
+
+class LBPHGallery:
+    """Vectorized drop-in for `LBPHFaceRecognizer.predict` over a whole frame's faces.
+
+    The stored histograms live in one contiguous (N, D) float32 matrix and all
+    query faces are scored against it with OpenCV's chi-square distance
+    (HISTCMP_CHISQR_ALT, `2 * sum((q - g)^2 / (q + g))`). Rewritten as
+        (q - g)^2 / (q + g) = g - 3 q + 4 q^2 / (q + g)
+    the row sums of the gallery are precomputed and only the bins where the
+    query is non-zero have to be visited, one cache-sized block of gallery
+    rows at a time. Results match `predict`: same label (lowest distance,
+    first on ties, -1 above the model threshold) and the same distance up to
+    float rounding.
+
+    Compact storages are matched as they are: each block of float16 or
+    uint8 codes is widened (and scaled) into the float32 block, so the
+    matrix itself is never expanded. Exactly stored uint8 rows give the
+    same distances as float32.
+    """
+
+    def __init__(self, model, chunk_rows=512, index=None):
+        self.model = model
+        self.chunk_rows = chunk_rows
+        # Optional GalleryIndex.IVFIndex; queries then only visit candidate rows
+        self.index = index
+        self._row_sums = model.histogram_sums()
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(load_lbph_model(path), **kwargs)
+
+    @classmethod
+    def from_recognizer(cls, recognizer, **kwargs):
+        """Build a gallery from a trained `cv2.face.LBPHFaceRecognizer` without a file round-trip."""
+        histograms = recognizer.getHistograms()
+        labels = recognizer.getLabels()
+        model = LBPHModel(
+            np.vstack([h.reshape(-1) for h in histograms]) if len(histograms) else np.zeros((0, 0)),
+            labels.reshape(-1) if labels is not None else np.zeros(0),
+            radius=recognizer.getRadius(), neighbors=recognizer.getNeighbors(),
+            grid_x=recognizer.getGridX(), grid_y=recognizer.getGridY(),
+            threshold=recognizer.getThreshold())
+        return cls(model, **kwargs)
+
+    def __len__(self):
+        return len(self.model.labels)
+
+    def histogram(self, face):
+        m = self.model
+        return spatial_histogram(lbp_codes(face, m.radius, m.neighbors), m.num_patterns, m.grid_x, m.grid_y)
+
+    def frame_histograms(self, gray, boxes):
+        """Histograms of several face boxes of one grayscale frame -> (K, D).
+
+        Each face is described at its native size, straight from the frame
+        (no resize to 200x200), so row k equals `histogram(gray[y:y1, x:x1])`
+        of the clipped box, which is how FaceTrainer stores its training
+        faces. Boxes too small for any LBP code get an all-zero row.
+        """
+        m = self.model
+        (h, w) = gray.shape[:2]
+        out = np.zeros((len(boxes), m.grid_x * m.grid_y * m.num_patterns), dtype=np.float32)
+        for k, (x, y, x1, y1) in enumerate(boxes):
+            x, y, x1, y1 = max(int(x), 0), max(int(y), 0), min(int(x1), w), min(int(y1), h)
+            if x1 - x > 2 * m.radius and y1 - y > 2 * m.radius:
+                out[k] = self.histogram(gray[y:y1, x:x1])
+        return out
+
+    def predict_boxes(self, gray, boxes):
+        """Recognize every face box of a grayscale frame at once; returns [(label, distance), ...]."""
+        if not len(boxes):
+            return []
+        return self.match(self.frame_histograms(gray, boxes))
+
+    def distances(self, queries, rows=None):
+        """Chi-square distances between (K, D) query histograms and every stored histogram -> (K, N).
+
+        With `rows`, only those gallery rows are scored -> (K, len(rows)).
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        gallery, scales = self.model.codes, self.model.scales
+        row_sums = self._row_sums
+        if rows is not None:
+            gallery, row_sums = gallery[rows], row_sums[rows]
+            scales = scales[rows] if scales is not None else None
+        out = np.empty((len(queries), len(gallery)), dtype=np.float64)
+        shape = (min(self.chunk_rows, len(gallery)), gallery.shape[1])
+        block = np.empty(shape, dtype=np.float32)
+        # Compact codes are gathered into a block of their own dtype first
+        gathered = block if gallery.dtype == np.float32 else np.empty(shape, dtype=gallery.dtype)
+        for k, q in enumerate(queries):
+            nz = np.flatnonzero(q)
+            qv = q[nz]
+            q_sq = qv * qv
+            q_sum = float(qv.sum(dtype=np.float64))
+            for start in range(0, len(gallery), self.chunk_rows):
+                rows = slice(start, start + self.chunk_rows)
+                n = len(gallery[rows])
+                g = np.take(gallery[rows], nz, axis=1, out=gathered[:n, :len(nz)])
+                if scales is not None:
+                    g = np.multiply(g, scales[rows, None], out=block[:n, :len(nz)])
+                # q^2 / (q + g), in place in the reused block
+                g = np.add(g, qv, out=block[:n, :len(nz)])
+                np.divide(q_sq, g, out=g)
+                out[k, rows] = 8.0 * g.sum(axis=1, dtype=np.float64)
+            out[k] += 2.0 * (row_sums - 3.0 * q_sum)
+        # Exact zeros can come out as tiny negatives after the rearrangement
+        np.maximum(out, 0.0, out=out)
+        return out
+
+    def match(self, queries):
+        """(label, distance) per query histogram, with `predict`'s threshold semantics."""
+        if len(self) == 0:
+            return [(-1, float(np.finfo(np.float64).max)) for _ in range(len(queries))]
+        queries = np.atleast_2d(queries)
+        candidates = self.index.probe(queries) if self.index is not None else None
+        if candidates is None:
+            dist = self.distances(queries)
+            best = [(i, float(dist[k, i])) for k, i in enumerate(dist.argmin(axis=1))]
+        else:
+            best = []
+            for q, rows in zip(queries, candidates):
+                if not len(rows):
+                    best.append((None, float(np.finfo(np.float64).max)))
+                    continue
+                dist = self.distances(q, rows)[0]
+                j = int(dist.argmin())
+                best.append((rows[j], float(dist[j])))
+
+        results = []
+        for i, d in best:
+            if i is not None and d < self.model.threshold:
+                results.append((int(self.model.labels[i]), d))
+            else:
+                results.append((-1, float(np.finfo(np.float64).max)))
+        return results
+
+    def predict_batch(self, faces):
+        """Recognize several grayscale face crops at once; returns [(label, distance), ...]."""
+        if not len(faces):
+            return []
+        return self.match(np.vstack([self.histogram(face) for face in faces]))
+
+    def predict(self, face):
+        return self.predict_batch([face])[0]
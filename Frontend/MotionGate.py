@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Frame-differencing gate that decides whether the face detector needs to run.
+
+    Each frame is shrunk to a small blurred grayscale thumbnail and compared
+    with the thumbnail of the last frame the gate let through. When the
+    fraction of changed pixels stays below `min_changed_fraction` the caller
+    can reuse its previous detections. `refresh_interval` forces a detection
+    every so many frames regardless, so a face that walks in slowly is never
+    missed for long.
+    """
+
+    def __init__(self, size=(64, 48), pixel_threshold=15, min_changed_fraction=0.002,
+                 refresh_interval=90):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.refresh_interval = refresh_interval
+        self._reference = None
+        self._since_refresh = 0
+        self.checked = 0
+        self.skipped = 0
+        # Thumbnail work buffers, reused for every frame
+        (w, h) = size
+        self._small = np.empty((h, w), dtype=np.uint8)
+        self._thumbs = [np.empty((h, w), dtype=np.uint8) for _ in range(2)]
+        self._diff = np.empty((h, w), dtype=np.uint8)
+
+    def _thumbnail(self, gray):
+        # Write into whichever thumbnail buffer is not the current reference
+        thumb = self._thumbs[1] if self._reference is self._thumbs[0] else self._thumbs[0]
+        cv2.resize(gray, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.GaussianBlur(self._small, (5, 5), 0, dst=thumb)
+        return thumb
+
+    def should_detect(self, gray):
+        """True when something moved since the last detection or a refresh is due."""
+        thumb = self._thumbnail(gray)
+        self.checked += 1
+        self._since_refresh += 1
+
+        if self._reference is not None and self._since_refresh < self.refresh_interval:
+            cv2.absdiff(thumb, self._reference, dst=self._diff)
+            cv2.threshold(self._diff, self.pixel_threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+            changed = cv2.countNonZero(self._diff) / self._diff.size
+            if changed < self.min_changed_fraction:
+                self.skipped += 1
+                return False
+
+        # Compare future frames against the last frame that was let through
+        self._reference = thumb
+        self._since_refresh = 0
+        return True
+
+    def reset(self):
+        self._reference = None
+        self._since_refresh = 0
+
+    @property
+    def hit_rate(self):
+        """Fraction of frames on which the gate let the detector be skipped."""
+        return self.skipped / self.checked if self.checked else 0.0
@@ -0,0 +1,346 @@
+import os
+
+import cv2
+import numpy as np
+
+from GalleryCompaction import compact
+from GalleryIndex import IVFIndex, index_path_for
+from LBPHGallery import LBPHGallery, LBPHModel, is_opencv_model_path, save_lbph_model
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+_MODELS_DIR = os.path.join(_REPO_ROOT, 'real-time-face-recognition')
+
+
+def _replace_file(path, write):
+    """Write `path` through `write(tmp_path)` and move it into place with one os.replace.
+
+    Readers (the live feed, the inference workers) never see a half-written
+    gallery, and a failed write leaves the previous one intact.
+    """
+    root, ext = os.path.splitext(path)
+    # Same extension: cv2.FileStorage picks the format from it
+    tmp_path = f"{root}.tmp{ext}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class RecognitionBackend:
+    """Common interface of the face recognition backends.
+
+    `train` builds the enrolled gallery from BGR face crops and saves it to
+    `gallery_path`; `load` reads it back (False when nothing is enrolled yet).
+    `predict_boxes` recognises every face box of a frame at once and returns
+    `(label, distance)` pairs on LBPH's scale, where a distance below 50 is a
+    confident match.
+
+    Large galleries can get an IVFIndex (`build_index`), saved next to the
+    gallery file; `nprobe` overrides the number of lists searched per query.
+    Without an index, or when it no longer matches the gallery, every stored
+    sample is scanned.
+    """
+
+    name = None
+    # Whether the backend works on grayscale face crops (it accepts BGR ones either way)
+    grayscale = False
+    gallery_path = None
+    nprobe = None
+    # PCA components of the index's coarse vectors (None: index the descriptors as they are)
+    index_components = None
+
+    @property
+    def index_path(self):
+        return index_path_for(self.gallery_path)
+
+    def load(self):
+        raise NotImplementedError
+
+    def train(self, faces, ids):
+        raise NotImplementedError
+
+    def predict_boxes(self, frame, boxes, gray=None):
+        raise NotImplementedError
+
+    def update(self, faces, ids, prototypes=None, method='kmeans'):
+        """Enroll BGR `faces` of `ids` into the loaded gallery without touching anyone else's samples.
+
+        Samples already stored under these ids are replaced. With
+        `prototypes`, the new samples are compacted first (see `compact`).
+        The gallery and its index, whose lists take the new rows in, are
+        rewritten atomically.
+        """
+        raise NotImplementedError
+
+    def descriptors(self):
+        """The stored (N, D) descriptor matrix the index is built over."""
+        raise NotImplementedError
+
+    def __len__(self):
+        """Number of stored samples."""
+        raise NotImplementedError
+
+    def compact(self, prototypes=3, method='kmeans'):
+        """Reduce every enrolled identity to at most `prototypes` samples and save the gallery.
+
+        'medoids' keeps the most representative real samples, 'kmeans'
+        stores cluster means. Any index must be rebuilt afterwards.
+        """
+        raise NotImplementedError
+
+    def build_index(self, nlist=None, nprobe=16):
+        index = IVFIndex.build(self.descriptors(), nlist, nprobe, components=self.index_components)
+        _replace_file(self.index_path, index.save)
+        self._set_index(index)
+        return index
+
+    def drop_index(self):
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        self._set_index(None)
+
+    def _load_index(self, count):
+        if not os.path.exists(self.index_path):
+            return None
+        index = IVFIndex.load(self.index_path)
+        if len(index) != count:
+            print(f"[WARNING] Ignoring stale gallery index {self.index_path}; using exact search")
+            return None
+        if self.nprobe:
+            index.nprobe = self.nprobe
+        return index
+
+    def _update_index(self, index, keep, vectors):
+        if index is None:
+            # An index that was not in use (stale) would not match the updated gallery either
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            return None
+        index = index.update(keep, vectors)
+        _replace_file(self.index_path, index.save)
+        return index
+
+    def _set_index(self, index):
+        raise NotImplementedError
+
+
+class LBPHBackend(RecognitionBackend):
+    """LBPH histograms, matched with the vectorized LBPHGallery.
+
+    The gallery is saved in the memory-mappable binary format
+    (`trainer.lbph`, see LBPHGallery.write_lbph_binary), or in OpenCV's
+    format when `gallery_path` ends in .yml. Installs that only have the old
+    `trainer.yml` keep loading it until the next training run, or until it
+    is converted with `python Frontend/ConvertModel.py`.
+
+    Binary galleries keep their histograms in `storage` (see
+    LBPHGallery.STORAGES), on disk and in memory: by default uint8 counts
+    with a per-row scale, a quarter of float32 and exact for nearly every
+    sample. Every process maps the same compact file.
+    """
+
+    name = 'lbph'
+    grayscale = True
+    index_components = 64
+
+    def __init__(self, gallery_path=None, nprobe=None, storage='uint8'):
+        self.gallery_path = gallery_path or os.path.join(_REPO_ROOT, 'trainer.lbph')
+        # Read when the default gallery has not been written yet
+        self.legacy_path = None if gallery_path else os.path.join(_REPO_ROOT, 'trainer.yml')
+        self.nprobe = nprobe
+        self.storage = storage
+        self.gallery = None
+
+    def load(self):
+        path = self.gallery_path
+        if not os.path.exists(path):
+            if not self.legacy_path or not os.path.exists(self.legacy_path):
+                return False
+            path = self.legacy_path
+            print(f"[INFO] Loading {path}; convert it with ConvertModel.py for a faster start")
+        self.gallery = LBPHGallery.from_file(path)
+        self.gallery.index = self._load_index(len(self.gallery))
+        return True
+
+    def train(self, faces, ids):
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.train([self._gray(face) for face in faces], np.array(ids))
+        self.gallery = LBPHGallery(self._save(LBPHGallery.from_recognizer(recognizer).model))
+
+    def update(self, faces, ids, prototypes=None, method='kmeans'):
+        # The histograms LBPHFaceRecognizer.update would append, computed by the
+        # gallery instead so the stored samples never go through a cv2 reload
+        histograms = np.vstack([self.gallery.histogram(self._gray(face)) for face in faces])
+        labels = np.asarray(ids, dtype=np.int32)
+        if prototypes:
+            histograms, labels = compact(histograms, labels, self._chi_square, prototypes, method)
+        model = self.gallery.model
+        keep = ~np.isin(model.labels, labels)
+        if not is_opencv_model_path(self.gallery_path):
+            # Only converts a model loaded in another storage (a legacy trainer.yml)
+            model = model.quantized(self.storage)
+        model = self._save(model.with_rows(keep, histograms, labels))
+        self.gallery = LBPHGallery(model, index=self._update_index(self.gallery.index, keep, histograms))
+
+    def _save(self, model):
+        """Write `model` (in `storage`, unless saved in OpenCV's format) and return what was written."""
+        if not is_opencv_model_path(self.gallery_path):
+            model = model.quantized(self.storage)
+        _replace_file(self.gallery_path, lambda path: save_lbph_model(model, path))
+        return model
+
+    @staticmethod
+    def _gray(face):
+        return face if face.ndim == 2 else cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+
+    def predict_boxes(self, frame, boxes, gray=None):
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return self.gallery.predict_boxes(gray, boxes)
+
+    def descriptors(self):
+        return self.gallery.model.histograms
+
+    def __len__(self):
+        return len(self.gallery) if self.gallery is not None else 0
+
+    @staticmethod
+    def _chi_square(queries, histograms):
+        return LBPHGallery(LBPHModel(histograms, np.zeros(len(histograms)))).distances(queries)
+
+    def compact(self, prototypes=3, method='kmeans'):
+        model = self.gallery.model
+        histograms, labels = compact(model.histograms, model.labels, self._chi_square, prototypes, method)
+        model = LBPHModel(histograms, labels, model.radius, model.neighbors, model.grid_x, model.grid_y,
+                          model.threshold)
+        self.gallery = LBPHGallery(self._save(model))
+
+    def _set_index(self, index):
+        self.gallery.index = index
+
+
+class SFaceBackend(RecognitionBackend):
+    """OpenCV's SFace embedding model (cv2.FaceRecognizerSF) with cosine-similarity search.
+
+    Enrolled faces are stored as L2-normalised 128-d embeddings, saved as
+    float16 in `embeddings.npz` next to the LBPH model, so training only runs
+    the model over the face crops. A query is one matrix product against the
+    gallery, or against its index candidates. Cosine similarity is reported
+    as a distance scaled so that SFace's recommended match threshold (0.363)
+    lands on LBPH's 50.
+    """
+
+    name = 'sface'
+    input_size = (112, 112)
+    cosine_threshold = 0.363
+
+    def __init__(self, model_path=None, gallery_path=None, nprobe=None):
+        self.model_path = model_path or os.path.join(_MODELS_DIR, 'face_recognition_sface_2021dec.onnx')
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"SFace model not found: {self.model_path}")
+        self.gallery_path = gallery_path or os.path.join(_REPO_ROOT, 'embeddings.npz')
+        self.nprobe = nprobe
+        self.model = cv2.FaceRecognizerSF.create(self.model_path, "")
+        self.embeddings = np.zeros((0, 128), dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int32)
+        self.index = None
+
+    def embed(self, faces):
+        """L2-normalised embeddings of BGR face crops -> (K, 128) float32."""
+        features = np.zeros((len(faces), 128), dtype=np.float32)
+        for i, face in enumerate(faces):
+            if face.size:
+                features[i] = self.model.feature(cv2.resize(face, self.input_size)).reshape(-1)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return features / np.maximum(norms, 1e-12)
+
+    def load(self):
+        if not os.path.exists(self.gallery_path):
+            return False
+        with np.load(self.gallery_path) as data:
+            # float16 on disk; searched in float32 so the product goes through BLAS
+            self.embeddings = data['embeddings'].astype(np.float32)
+            self.labels = data['labels'].astype(np.int32)
+        self.index = self._load_index(len(self.labels))
+        return True
+
+    def train(self, faces, ids):
+        self.index = None
+        self.embeddings = self.embed(faces)
+        self.labels = np.asarray(ids, dtype=np.int32)
+        _replace_file(self.gallery_path, self._save)
+
+    def update(self, faces, ids, prototypes=None, method='kmeans'):
+        embeddings = self.embed(faces)
+        labels = np.asarray(ids, dtype=np.int32)
+        if prototypes:
+            embeddings, labels = compact(embeddings, labels, self._cosine_distance, prototypes, method, self._normalize)
+        keep = ~np.isin(self.labels, labels)
+        self.embeddings = np.vstack((self.embeddings[keep], embeddings))
+        self.labels = np.concatenate((self.labels[keep], labels))
+        _replace_file(self.gallery_path, self._save)
+        self.index = self._update_index(self.index, keep, embeddings)
+
+    def _save(self, path):
+        np.savez(path, embeddings=self.embeddings.astype(np.float16), labels=self.labels)
+
+    def predict_boxes(self, frame, boxes, gray=None):
+        if not len(boxes):
+            return []
+        if not len(self.labels):
+            return [(-1, float(np.finfo(np.float64).max))] * len(boxes)
+        (h, w) = frame.shape[:2]
+        crops = [frame[max(y, 0):min(y1, h), max(x, 0):min(x1, w)] for (x, y, x1, y1) in boxes]
+        queries = self.embed(crops)
+        scale = 50.0 / (1.0 - self.cosine_threshold)
+        candidates = self.index.probe(queries) if self.index is not None else None
+        if candidates is None:
+            similarity = queries @ self.embeddings.T
+            best = [(i, similarity[k, i]) for k, i in enumerate(similarity.argmax(axis=1))]
+        else:
+            best = []
+            for q, rows in zip(queries, candidates):
+                similarity = self.embeddings[rows] @ q if len(rows) else np.full(1, -1.0)
+                j = int(similarity.argmax())
+                best.append((rows[j] if len(rows) else 0, similarity[j]))
+        return [(int(self.labels[i]), float((1.0 - sim) * scale)) for i, sim in best]
+
+    def descriptors(self):
+        return self.embeddings
+
+    def __len__(self):
+        return len(self.labels)
+
+    @staticmethod
+    def _cosine_distance(a, b):
+        return 1.0 - a @ b.T
+
+    @staticmethod
+    def _normalize(vectors):
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def compact(self, prototypes=3, method='kmeans'):
+        self.embeddings, self.labels = compact(self.embeddings, self.labels, self._cosine_distance,
+                                               prototypes, method, self._normalize)
+        _replace_file(self.gallery_path, self._save)
+        self.index = None
+
+    def _set_index(self, index):
+        self.index = index
+
+
+RECOGNITION_BACKENDS = {
+    LBPHBackend.name: LBPHBackend,
+    SFaceBackend.name: SFaceBackend,
+}
+
+
+def create_backend(backend='lbph', **kwargs):
+    """Build a recognition backend by name: 'lbph' or 'sface'."""
+    try:
+        backend_cls = RECOGNITION_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown face recognition backend: {backend!r}") from None
+    return backend_cls(**kwargs)
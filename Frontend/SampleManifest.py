@@ -0,0 +1,209 @@
+"""Manifest of the captured face samples, kept in the app's SQLite database.
+
+Usage:
+    python Frontend/SampleManifest.py [images]
+
+Run it after copying or deleting images by hand; it rescans the directory
+and prints the per-user sample counts.
+"""
+import collections
+import hashlib
+import os
+import sqlite3
+import sys
+
+import cv2
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_DB_PATH = os.path.join(_REPO_ROOT, 'insightx.db')
+
+# One manifest row; `size` and `mtime_ns` are the file's as recorded
+Sample = collections.namedtuple('Sample', 'name user_id size mtime_ns')
+
+
+def connect(path=None, **kwargs):
+    """Connection to the app database, in WAL mode so readers never wait for a writer."""
+    conn = sqlite3.connect(path or DEFAULT_DB_PATH, timeout=10, **kwargs)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def directory_key(directory):
+    """How a directory is keyed in the database: relative to the repo, so the database survives moving it."""
+    directory = os.path.abspath(directory)
+    try:
+        return os.path.relpath(directory, _REPO_ROOT)
+    except ValueError:
+        return directory
+
+
+def sample_name(user_id, count):
+    return f"User-{user_id}-{count}.jpg"
+
+
+def parse_user_id(filename):
+    """User ID of a `User-<id>-<n>.jpg` file name, or None for other files."""
+    try:
+        return int(filename.split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def quality_score(face):
+    """Sharpness of a face crop: variance of its Laplacian (blurred crops score low)."""
+    gray = face if face.ndim == 2 else cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class SampleManifest:
+    """Every face sample of an image directory: user ID, size, mtime, content hash and quality.
+
+    The capture code records each crop as it writes it, so the next user ID,
+    per-user sample counts and the samples added since the last training run
+    are indexed queries instead of a listing of the whole directory. A
+    directory is scanned once when it is first seen (importing existing
+    images, whose quality is unknown), and again by `scan()` on every full
+    retrain, to pick up files copied in or deleted by hand.
+    """
+
+    def __init__(self, directory, path=None):
+        self.directory = os.path.abspath(directory)
+        self.key = directory_key(self.directory)
+        self._conn = connect(path)
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS samples (
+                    directory TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha1 TEXT NOT NULL,
+                    quality REAL,
+                    trained INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (directory, name));
+                CREATE INDEX IF NOT EXISTS samples_user ON samples (directory, user_id);
+                CREATE INDEX IF NOT EXISTS samples_untrained ON samples (directory, user_id) WHERE trained = 0;
+                CREATE TABLE IF NOT EXISTS scanned_directories (directory TEXT PRIMARY KEY);
+            """)
+        self._imported = False
+
+    def close(self):
+        self._conn.close()
+
+    def _ensure_imported(self):
+        if self._imported:
+            return
+        self._imported = True
+        seen = self._conn.execute("SELECT 1 FROM scanned_directories WHERE directory = ?", (self.key,)).fetchone()
+        if seen is None:
+            print(f"[INFO] Importing {self.directory} into the sample manifest")
+            self.scan()
+
+    def save_face(self, user_id, count, face):
+        """Write a captured face crop as User-<id>-<count>.jpg and record it."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = sample_name(user_id, count)
+        ok, encoded = cv2.imencode('.jpg', face)
+        if not ok:
+            raise ValueError(f"Could not encode face crop {name}")
+        data = encoded.tobytes()
+        with open(os.path.join(self.directory, name), 'wb') as f:
+            f.write(data)
+        self._record(name, user_id, data, quality_score(face))
+        return os.path.join(self.directory, name)
+
+    def _record(self, name, user_id, data, quality=None):
+        stat = os.stat(os.path.join(self.directory, name))
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO samples (directory, name, user_id, size, mtime_ns, sha1, quality, trained) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (self.key, name, user_id, stat.st_size, stat.st_mtime_ns, hashlib.sha1(data).hexdigest(), quality))
+
+    def scan(self):
+        """Reconcile the manifest with the directory; returns (added or changed, removed) file counts."""
+        filenames = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        known = {name: (size, mtime_ns) for name, size, mtime_ns in self._conn.execute(
+            "SELECT name, size, mtime_ns FROM samples WHERE directory = ?", (self.key,))}
+        changed = 0
+        for filename in filenames:
+            user_id = parse_user_id(filename)
+            if user_id is None:
+                print(f"[WARNING] Skipping file with unexpected format: {os.path.join(self.directory, filename)}")
+                continue
+            stat = os.stat(os.path.join(self.directory, filename))
+            if known.pop(filename, None) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            with open(os.path.join(self.directory, filename), 'rb') as f:
+                self._record(filename, user_id, f.read())
+            changed += 1
+        with self._conn:
+            # Whatever is left was deleted from the directory
+            self._conn.executemany("DELETE FROM samples WHERE directory = ? AND name = ?",
+                                   [(self.key, name) for name in known])
+            self._conn.execute("INSERT OR IGNORE INTO scanned_directories (directory) VALUES (?)", (self.key,))
+        self._imported = True
+        if changed or known:
+            print(f"[INFO] Sample manifest updated: {changed} added or changed, {len(known)} removed")
+        return changed, len(known)
+
+    def samples(self, ids=None):
+        """Samples of the users `ids` (everyone by default), ordered by user and name."""
+        self._ensure_imported()
+        query = "SELECT name, user_id, size, mtime_ns FROM samples WHERE directory = ?"
+        params = [self.key]
+        if ids is not None:
+            ids = [int(id) for id in ids]
+            query += f" AND user_id IN ({', '.join('?' * len(ids))})"
+            params += ids
+        return [Sample(*row) for row in self._conn.execute(query + " ORDER BY user_id, name", params)]
+
+    def next_user_id(self):
+        """Smallest user ID without samples."""
+        self._ensure_imported()
+        (user_id,) = self._conn.execute("""
+            SELECT MIN(candidate) FROM (
+                SELECT 1 AS candidate
+                UNION SELECT DISTINCT user_id + 1 FROM samples WHERE directory = ?1)
+            WHERE candidate NOT IN (SELECT user_id FROM samples WHERE directory = ?1)
+        """, (self.key,)).fetchone()
+        return user_id
+
+    def sample_count(self, user_id):
+        self._ensure_imported()
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM samples WHERE directory = ? AND user_id = ?",
+                                      (self.key, int(user_id))).fetchone()
+        return count
+
+    def sample_counts(self):
+        """{user_id: number of samples}."""
+        self._ensure_imported()
+        return dict(self._conn.execute(
+            "SELECT user_id, COUNT(*) FROM samples WHERE directory = ? GROUP BY user_id", (self.key,)))
+
+    def changed_user_ids(self):
+        """Users with samples added or changed since they were last trained."""
+        self._ensure_imported()
+        return [user_id for (user_id,) in self._conn.execute(
+            "SELECT DISTINCT user_id FROM samples WHERE directory = ? AND trained = 0 ORDER BY user_id",
+            (self.key,))]
+
+    def mark_trained(self, ids=None):
+        """Record that the samples of `ids` (everyone by default) are in the saved model."""
+        query = "UPDATE samples SET trained = 1 WHERE directory = ? AND trained = 0"
+        params = [self.key]
+        if ids is not None:
+            ids = [int(id) for id in ids]
+            query += f" AND user_id IN ({', '.join('?' * len(ids))})"
+            params += ids
+        with self._conn:
+            self._conn.execute(query, params)
+
+
+if __name__ == '__main__':
+    manifest = SampleManifest(sys.argv[1] if len(sys.argv) > 1 else os.path.join(_REPO_ROOT, 'images'))
+    manifest.scan()
+    for user_id, count in sorted(manifest.sample_counts().items()):
+        print(f"User {user_id}: {count} samples")
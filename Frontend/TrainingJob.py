@@ -0,0 +1,50 @@
+import threading
+import traceback
+
+from PyQt5 import QtCore
+
+from FaceTrainer import FaceTrainer, TrainingCancelled
+
+
+class TrainingJob(QtCore.QThread):
+    """Runs `FaceTrainer.train` (or `enroll` for the given `ids`) off the GUI thread.
+
+    Progress is reported per image and per stage. `cancel()` stops the job
+    before the new model is written, so the saved model only ever changes
+    when the job succeeds. Exactly one of `succeeded`, `cancelled` or
+    `failed` is emitted at the end.
+    """
+
+    progress = QtCore.pyqtSignal(int, int)  # images processed, images to process
+    stage_changed = QtCore.pyqtSignal(str)
+    succeeded = QtCore.pyqtSignal()
+    cancelled = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, ids=None, parent=None, **trainer_kwargs):
+        super().__init__(parent)
+        self.ids = ids
+        self.trainer_kwargs = trainer_kwargs
+        self._stop = threading.Event()
+
+    def cancel(self):
+        self._stop.set()
+
+    def run(self):
+        try:
+            # The detector is loaded here as well, so nothing slow happens on the GUI thread
+            trainer = FaceTrainer(progress=self.progress.emit, stage=self.stage_changed.emit,
+                                  should_stop=self._stop.is_set, **self.trainer_kwargs)
+            saved = trainer.enroll(self.ids) if self.ids else trainer.train()
+        except TrainingCancelled:
+            print("[INFO] Training cancelled; the previous model is unchanged")
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(str(e))
+            return
+        if saved:
+            self.succeeded.emit()
+        else:
+            self.failed.emit("No faces found for training.")
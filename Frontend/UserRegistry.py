@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+
+from SampleManifest import DEFAULT_DB_PATH, connect
+
+_REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_UPSERT = ("INSERT INTO users (id, name, roll_no, contact) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT (id) DO UPDATE SET name = excluded.name, roll_no = excluded.roll_no, "
+           "contact = excluded.contact")
+
+
+class UserRegistry:
+    """Registered people (name, roll number, contact) in the app's SQLite database.
+
+    Every write is a single-row transaction; lookups by ID and by roll
+    number are indexed. A trigger bumps `version()` on every change, so a
+    running recognizer can poll that one row and reload only when someone
+    was added or edited. An existing names.json is imported the first time
+    the registry is opened; the file itself is no longer written.
+
+    Entries are dicts with the keys names.json used: name, roll_no, contact.
+    One connection is shared by all threads, behind a lock.
+    """
+
+    def __init__(self, path=None, names_json=None):
+        self._lock = threading.Lock()
+        self._conn = connect(path or DEFAULT_DB_PATH, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    roll_no TEXT NOT NULL DEFAULT '',
+                    contact TEXT NOT NULL DEFAULT '');
+                CREATE INDEX IF NOT EXISTS users_roll_no ON users (roll_no);
+                CREATE TABLE IF NOT EXISTS users_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    version INTEGER NOT NULL,
+                    names_json_imported INTEGER NOT NULL);
+                INSERT OR IGNORE INTO users_state VALUES (0, 0, 0);
+                CREATE TRIGGER IF NOT EXISTS users_insert AFTER INSERT ON users
+                    BEGIN UPDATE users_state SET version = version + 1; END;
+                CREATE TRIGGER IF NOT EXISTS users_update AFTER UPDATE ON users
+                    BEGIN UPDATE users_state SET version = version + 1; END;
+                CREATE TRIGGER IF NOT EXISTS users_delete AFTER DELETE ON users
+                    BEGIN UPDATE users_state SET version = version + 1; END;
+            """)
+        self._import_names_json(names_json or os.path.join(_REPO_ROOT, 'names.json'))
+
+    def close(self):
+        self._conn.close()
+
+    def _import_names_json(self, names_json):
+        with self._lock:
+            (imported,) = self._conn.execute("SELECT names_json_imported FROM users_state").fetchone()
+        if imported or not os.path.exists(names_json):
+            return
+        try:
+            with open(names_json, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[WARNING] Could not import {names_json}: {e}")
+            return
+        rows = []
+        for key, entry in data.items():
+            try:
+                rows.append((int(key), entry.get('name', ''), entry.get('roll_no', ''), entry.get('contact', '')))
+            except (ValueError, AttributeError):
+                print(f"[WARNING] Skipping names.json entry with unexpected format: {key}")
+        with self._lock, self._conn:
+            # Users registered here since are kept over their names.json entry
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO users (id, name, roll_no, contact) VALUES (?, ?, ?, ?)", rows)
+            self._conn.execute("UPDATE users_state SET names_json_imported = 1")
+        print(f"[INFO] Imported {len(rows)} user(s) from {names_json}")
+
+    def add(self, user_id, name, roll_no='', contact=''):
+        """Register (or update) the person with `user_id`."""
+        with self._lock, self._conn:
+            self._conn.execute(_UPSERT, (int(user_id), name, roll_no, contact))
+
+    def next_free_id(self, manifest):
+        """Smallest user ID free in both `manifest` and the registry (someone may be registered without photos)."""
+        with self._lock:
+            return self._next_free_id(manifest)
+
+    def _next_free_id(self, manifest):
+        user_id = manifest.next_user_id()
+        while (self._conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is not None
+               or manifest.sample_count(user_id)):
+            user_id += 1
+        return user_id
+
+    def register(self, manifest, name, roll_no='', contact=''):
+        """Register a person whose photos are being captured into `manifest`; returns their user ID.
+
+        A roll number that is already registered keeps its ID (its photos are
+        retaken); anyone else gets `next_free_id`. The lookup, the allocation
+        and the insert are one IMMEDIATE transaction, so the app and
+        face_taker.py registering at the same time never share an ID.
+        """
+        # The manifest's first query imports its directory, a write; done before taking the write lock
+        manifest.next_user_id()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT id FROM users WHERE roll_no = ? ORDER BY id LIMIT 1",
+                                     (roll_no,)).fetchone()
+            user_id = row[0] if row is not None else self._next_free_id(manifest)
+            self._conn.execute(_UPSERT, (user_id, name, roll_no, contact))
+        return user_id
+
+    def get(self, user_id):
+        """Entry of `user_id`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT name, roll_no, contact FROM users WHERE id = ?",
+                                     (int(user_id),)).fetchone()
+        return None if row is None else _entry(row)
+
+    def find_by_roll(self, roll_no):
+        """(user_id, entry) of the person with `roll_no`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT id, name, roll_no, contact FROM users WHERE roll_no = ? "
+                                     "ORDER BY id LIMIT 1", (roll_no,)).fetchone()
+        return None if row is None else (row[0], _entry(row[1:]))
+
+    def users(self):
+        """Every entry, keyed by the user ID as a string like names.json."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, name, roll_no, contact FROM users").fetchall()
+        return {str(row[0]): _entry(row[1:]) for row in rows}
+
+    def version(self):
+        """Change counter; differs from an earlier value once any user was added, edited or removed."""
+        with self._lock:
+            (version,) = self._conn.execute("SELECT version FROM users_state").fetchone()
+        return version
+
+
+def _entry(row):
+    name, roll_no, contact = row
+    return {"name": name, "roll_no": roll_no, "contact": contact}
@@ -6,8 +6,9 @@ from VideoFaceRecognizer import VideoFaceRecognizer
 
 
 class VideoUploadPage(QtWidgets.QWidget):
-    def __init__(self):
+    def __init__(self, recognizer='lbph'):
         super().__init__()
+        self.recognizer_backend = recognizer
 
         self.setWindowTitle("Video Upload and Face Recognition")
         self.setStyleSheet("background-color: #1e1e1e; color: white; font-family: Arial;")
@@ -65,7 +66,7 @@ class VideoUploadPage(QtWidgets.QWidget):
             return
 
         self.video_path = file_path
-        recognizer = VideoFaceRecognizer(parent=self)
+        recognizer = VideoFaceRecognizer(parent=self, recognizer=self.recognizer_backend)
         recognizer.recognize(file_path)
 
 
@@ -1,4 +1,3 @@
-import os
 import sys
 import threading
 
@@ -7,7 +6,7 @@ from PyQt5 import QtWidgets, QtGui, QtSvg, QtCore
 
 from FaceCaptureWorker import FaceCaptureWorker
 from FaceRecognizer import FaceRecognizer
-from FaceTrainer import FaceTrainer
+from TrainingJob import TrainingJob
 from VideoUploadPage import VideoUploadPage
 from VideoFaceRecognizer import VideoFaceRecognizer
 from resources_rc import *
@@ -186,6 +185,9 @@ class AdminLogin(QtWidgets.QWidget):
 # DASHBOARD CLASS
 ###################################################################################################
 class Dashboard(QtWidgets.QMainWindow):
+    # Face recognition backend used for enrollment, the live feed and video: 'lbph' or 'sface'
+    recognition_backend = 'lbph'
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("InsightX Dashboard")
@@ -194,6 +196,7 @@ class Dashboard(QtWidgets.QMainWindow):
         self.capture = None
         self.timer = None
         self.selected_image_path = None
+        self.training_job = None
         self.setup_ui()
         self.apply_light_theme()
         self.face_capture = FaceCaptureWorker()
@@ -209,7 +212,7 @@ class Dashboard(QtWidgets.QMainWindow):
         self.create_main_menu()
         self.create_live_feed_page()
         self.create_data_entry_page()
-        self.video_upload_page = VideoUploadPage()
+        self.video_upload_page = VideoUploadPage(recognizer=self.recognition_backend)
         self.stacked_widget.addWidget(self.video_upload_page)
         # self.create_video_upload_page()
 
@@ -360,7 +363,9 @@ class Dashboard(QtWidgets.QMainWindow):
         return card
 
     def create_live_feed_page(self):
-        self.face_recognizer = FaceRecognizer()
+        # Full SSD detection every 5th frame with tracking in between, skipped while the room is static
+        self.face_recognizer = FaceRecognizer(detect_interval=5, motion_gate=True,
+                                              recognizer=self.recognition_backend)
 
         page = QtWidgets.QWidget()
         page.setObjectName("liveFeedPage")
@@ -491,7 +496,7 @@ class Dashboard(QtWidgets.QMainWindow):
         # SIGNAL CONNECTIONS
         self.face_recognizer.frame_processed.connect(self.update_video_feed)
         self.face_recognizer.status_updated.connect(self.update_status_info)
-        self.face_recognizer.person_detected.connect(self.update_person_info)
+        self.face_recognizer.faces_detected.connect(self.update_person_info)
 
         # BUTTON HANDLERS
         def start_camera():
@@ -512,10 +517,10 @@ class Dashboard(QtWidgets.QMainWindow):
 
     @QtCore.pyqtSlot(object)
     def update_video_feed(self, frame):
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb.shape
+        # Qt reads BGR directly, so no per-frame RGB copy; fromImage() copies into the pixmap
+        h, w, ch = frame.shape
         bytes_per_line = ch * w
-        qt_image = QtGui.QImage(rgb.data, w, h, bytes_per_line, QtGui.QImage.Format_RGB888)
+        qt_image = QtGui.QImage(frame.data, w, h, bytes_per_line, QtGui.QImage.Format_BGR888)
         self.video_label.setPixmap(QtGui.QPixmap.fromImage(qt_image))
 
     @QtCore.pyqtSlot(dict)
@@ -524,13 +529,25 @@ class Dashboard(QtWidgets.QMainWindow):
         self.fan_status.findChild(QtWidgets.QLabel, "value").setText(status["fan_status"])
         self.headcount.findChild(QtWidgets.QLabel, "value").setText(str(status["headcount"]))
 
-    @QtCore.pyqtSlot(dict)
-    def update_person_info(self, person):
-        self.person_label.setText(
-            f"Name: {person['name']}\n"
-            f"Roll No: {person['roll_no']}\n"
-            f"Contact: {person['contact']}"
-        )
+    @QtCore.pyqtSlot(list)
+    def update_person_info(self, faces):
+        # One FaceRecord per face in view, sent only when the people in view change
+        known = [face.identity for face in faces if face.identity is not None]
+        unknown = len(faces) - len(known)
+        if not faces:
+            self.person_label.setText("No person detected")
+        elif len(known) == 1 and not unknown:
+            person = known[0]
+            self.person_label.setText(
+                f"Name: {person.get('name', 'Unknown')}\n"
+                f"Roll No: {person.get('roll_no', 'N/A')}\n"
+                f"Contact: {person.get('contact', 'N/A')}"
+            )
+        else:
+            lines = [f"{person.get('name', 'Unknown')} ({person.get('roll_no', 'N/A')})" for person in known]
+            if unknown:
+                lines.append(f"{unknown} unknown")
+            self.person_label.setText("\n".join(lines))
 
     def create_status_item(self, label, value):
         frame = QtWidgets.QFrame()
@@ -799,23 +816,71 @@ class Dashboard(QtWidgets.QMainWindow):
             return
 
         # Check if either an image was uploaded OR a face was captured
-        captured_dir = "images"
-        face_id_prefix = f"User-{roll}"
-        has_captured_images = any(
-            fname.startswith(f"User-") and roll in fname for fname in os.listdir(captured_dir)) if os.path.exists(
-            captured_dir) else False
+        face_id = self.face_capture.face_id
+        has_captured_images = face_id is not None and self.face_capture.manifest.sample_count(face_id) > 0
 
         if not hasattr(self, 'selected_image_path') and not has_captured_images:
             QtWidgets.QMessageBox.warning(self, "Error", "Please capture or upload an image")
             return
 
-        # Create a trainer instance and train
-        trainer = FaceTrainer()
-        trainer.train()
+        if self.training_job is not None:
+            QtWidgets.QMessageBox.information(self, "Training", "A registration is already being trained")
+            return
 
+        # Only people with samples added since the last training run (per the
+        # sample manifest) are added to the model; with none, everyone is
+        # retrained from images/.
+        # Training runs on a QThread; the live feed keeps the old model until it succeeds
+        ids = self.face_capture.manifest.changed_user_ids() or None
+        self.training_job = TrainingJob(ids, parent=self, recognizer=self.recognition_backend)
+
+        self.training_progress = QtWidgets.QProgressDialog("Preparing training...", "Cancel", 0, 0, self)
+        self.training_progress.setWindowTitle("Registering Person")
+        self.training_progress.setModal(False)
+        self.training_progress.setMinimumDuration(0)
+        # Stay open between stages; closed when the job finishes
+        self.training_progress.setAutoReset(False)
+        self.training_progress.setAutoClose(False)
+        self.training_progress.canceled.connect(self.training_job.cancel)
+
+        self.training_job.progress.connect(self.update_training_progress)
+        self.training_job.stage_changed.connect(self.training_progress.setLabelText)
+        self.training_job.succeeded.connect(self.training_succeeded)
+        self.training_job.cancelled.connect(self.training_cancelled)
+        self.training_job.failed.connect(self.training_failed)
+        self.training_job.finished.connect(self.training_finished)
+        self.register_btn.setEnabled(False)
+        self.training_job.start()
+        self.training_progress.show()
+
+    @QtCore.pyqtSlot(int, int)
+    def update_training_progress(self, done, total):
+        self.training_progress.setMaximum(total)
+        self.training_progress.setValue(done)
+
+    def training_succeeded(self):
+        self.face_capture.face_id = None
+        # Loading a large model takes a while; the feed keeps the old one meanwhile
+        threading.Thread(target=self.face_recognizer.reload_recognizer, daemon=True).start()
         QtWidgets.QMessageBox.information(self, "Success", "Person registered successfully")
         self.clear_form()
 
+    def training_cancelled(self):
+        QtWidgets.QMessageBox.information(self, "Cancelled", "Training cancelled; the previous model is still in use")
+
+    def training_failed(self, message):
+        QtWidgets.QMessageBox.warning(self, "Error", f"Training failed: {message}")
+
+    def training_finished(self):
+        # Disconnected first: closing a progress dialog emits canceled
+        self.training_progress.canceled.disconnect(self.training_job.cancel)
+        self.training_progress.close()
+        self.training_progress.deleteLater()
+        self.training_progress = None
+        self.training_job.deleteLater()
+        self.training_job = None
+        self.register_btn.setEnabled(True)
+
     def clear_form(self):
         self.full_name.clear()
         self.roll_no.clear()
@@ -944,7 +1009,7 @@ class Dashboard(QtWidgets.QMainWindow):
         )
         if file_path:
             self.video_path = file_path
-            recognizer = VideoFaceRecognizer(parent=self)
+            recognizer = VideoFaceRecognizer(parent=self, recognizer=self.recognition_backend)
             recognizer.recognize(self.video_path)
 
     ###########################################################################
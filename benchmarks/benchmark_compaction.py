@@ -0,0 +1,88 @@
+"""Accuracy, size and latency of prototype-compacted LBPH galleries.
+
+Usage:
+    python benchmarks/benchmark_compaction.py [--identities 50] [--samples 30] [--queries 10]
+
+Every synthetic identity is enrolled with `--samples` crops, as FaceCaptureWorker
+stores them (shifted, re-lit and noisy views of one face), and recognised
+from `--queries` held-out views. The full gallery is compared with galleries
+compacted to a few medoids or k-means centroids per identity: trainer.yml
+size, load time, per-face predict time and accuracy.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from GalleryCompaction import compact  # noqa: E402
+from LBPHGallery import LBPHGallery, LBPHModel, read_lbph_model, write_lbph_model  # noqa: E402
+from synthetic_faces import identity  # noqa: E402
+
+
+def view(rng, face, crop=96):
+    # A detector crop: slightly shifted, re-lit, noisy
+    x, y = (int(v) for v in rng.integers(0, face.shape[0] - crop + 1, 2))
+    patch = face[y:y + crop, x:x + crop].astype(np.float32)
+    patch = patch * rng.uniform(0.7, 1.3) + rng.uniform(-20, 20) + rng.normal(0, 6, patch.shape)
+    return np.clip(patch, 0, 255).astype(np.uint8)
+
+
+def chi_square(queries, histograms):
+    return LBPHGallery(LBPHModel(histograms, np.zeros(len(histograms)))).distances(queries)
+
+
+def evaluate(name, model, queries, truth):
+    path = os.path.join(tempfile.mkdtemp(), 'trainer.yml')
+    write_lbph_model(model, path)
+    size_mb = os.path.getsize(path) / 1e6
+    start = time.perf_counter()
+    gallery = LBPHGallery(read_lbph_model(path))
+    load_s = time.perf_counter() - start
+    os.remove(path)
+
+    start = time.perf_counter()
+    labels = [label for label, _ in gallery.match(queries)]
+    predict_ms = (time.perf_counter() - start) / len(queries) * 1000.0
+    accuracy = np.mean(np.array(labels) == truth)
+    print(f"{name:<14}{len(gallery):>9}{size_mb:>9.1f}{load_s:>8.2f}{predict_ms:>12.2f}{accuracy:>10.3f}")
+    return accuracy, predict_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--identities', type=int, default=50)
+    parser.add_argument('--samples', type=int, default=30, help='enrolled crops per identity')
+    parser.add_argument('--queries', type=int, default=10, help='held-out crops per identity')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    faces = [identity(rng, size=112) for _ in range(args.identities)]
+    enrolled = [view(rng, face) for face in faces for _ in range(args.samples)]
+    labels = np.repeat(np.arange(1, args.identities + 1), args.samples).astype(np.int32)
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(enrolled, labels)
+    full = LBPHGallery.from_recognizer(recognizer).model
+
+    gallery = LBPHGallery(full)
+    queries = np.vstack([gallery.histogram(view(rng, face)) for face in faces for _ in range(args.queries)])
+    truth = np.repeat(np.arange(1, args.identities + 1), args.queries)
+
+    print(f"{'gallery':<14}{'samples':>9}{'yml MB':>9}{'load s':>8}{'predict ms':>12}{'accuracy':>10}")
+    base_accuracy, base_ms = evaluate('full', full, queries, truth)
+    for method, prototypes in (('medoids', 1), ('medoids', 3), ('medoids', 5), ('kmeans', 3)):
+        start = time.perf_counter()
+        histograms, kept = compact(full.histograms, full.labels, chi_square, prototypes, method)
+        compact_s = time.perf_counter() - start
+        model = LBPHModel(histograms, kept, full.radius, full.neighbors, full.grid_x, full.grid_y, full.threshold)
+        accuracy, ms = evaluate(f"{method} x{prototypes}", model, queries, truth)
+        print(f"{'':<14}compacted in {compact_s:.1f} s, accuracy {accuracy - base_accuracy:+.3f}, "
+              f"predict {base_ms / ms:.1f}x faster")
+
+
+if __name__ == '__main__':
+    main()
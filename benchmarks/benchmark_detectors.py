@@ -0,0 +1,121 @@
+"""Head-to-head benchmark of the face detector backends on a labelled clip.
+
+Usage:
+    python benchmarks/benchmark_detectors.py clip.mp4 clip_labels.json [--backends ssd,ssd@160,haar,yunet]
+
+The labels file maps frame indices to ground-truth boxes:
+    {"0": [[x, y, x1, y1], ...], "15": [...], ...}
+Only labelled frames count towards recall/precision; every frame counts
+towards latency and throughput.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from FaceDetector import create_detector  # noqa: E402
+from IdentityCache import box_iou  # noqa: E402
+
+
+def build_detector(spec, conf_threshold):
+    """'ssd', 'ssd@160' (SSD with a 160x160 input), 'haar' or 'yunet'."""
+    name, _, size = spec.partition('@')
+    kwargs = {'conf_threshold': conf_threshold}
+    if size:
+        kwargs['input_size'] = (int(size), int(size))
+    return create_detector(name, **kwargs)
+
+
+def load_frames(video_path, max_frames=None):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def match_counts(pred, truth, iou_threshold):
+    """Greedy one-to-one matching; returns the number of true positives."""
+    if len(pred) == 0 or len(truth) == 0:
+        return 0
+    iou = box_iou(truth, pred)
+    matched = 0
+    used = set()
+    for ti in range(len(truth)):
+        for pi in np.argsort(-iou[ti]):
+            if iou[ti, pi] < iou_threshold:
+                break
+            if pi not in used:
+                used.add(pi)
+                matched += 1
+                break
+    return matched
+
+
+def benchmark(detector, frames, labels, iou_threshold):
+    latencies = []
+    true_pos = n_truth = n_pred = 0
+    for index, frame in enumerate(frames):
+        start = time.perf_counter()
+        boxes, _ = detector.detect(frame)
+        latencies.append(time.perf_counter() - start)
+
+        truth = labels.get(str(index))
+        if truth is not None:
+            n_truth += len(truth)
+            n_pred += len(boxes)
+            true_pos += match_counts(boxes, truth, iou_threshold)
+
+    latencies = np.array(latencies) * 1000.0
+    return {
+        'mean_ms': float(latencies.mean()),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'fps': float(1000.0 / latencies.mean()),
+        'recall': true_pos / n_truth if n_truth else float('nan'),
+        'precision': true_pos / n_pred if n_pred else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video')
+    parser.add_argument('labels')
+    parser.add_argument('--backends', default='ssd,ssd@200,ssd@160,haar,yunet')
+    parser.add_argument('--conf', type=float, default=0.6)
+    parser.add_argument('--iou', type=float, default=0.5)
+    parser.add_argument('--max-frames', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.labels, 'r') as f:
+        labels = json.load(f)
+    frames = load_frames(args.video, args.max_frames)
+    if not frames:
+        print(f"[ERROR] No frames read from {args.video}")
+        return
+
+    print(f"[INFO] {len(frames)} frames, {len(labels)} labelled")
+    print(f"{'backend':<12}{'mean ms':>10}{'p95 ms':>10}{'fps':>10}{'recall':>10}{'precision':>11}")
+    for spec in args.backends.split(','):
+        try:
+            detector = build_detector(spec.strip(), args.conf)
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"{spec:<12}skipped: {str(e).strip().splitlines()[-1]}")
+            continue
+        # Warm up so one-off allocations do not skew the latency numbers
+        detector.detect(frames[0])
+        r = benchmark(detector, frames, labels, args.iou)
+        print(f"{spec:<12}{r['mean_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['fps']:>10.1f}"
+              f"{r['recall']:>10.3f}{r['precision']:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
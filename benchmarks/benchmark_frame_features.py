@@ -0,0 +1,65 @@
+"""Feature extraction cost for crowded frames: resized crops versus native-size crops.
+
+Usage:
+    python benchmarks/benchmark_frame_features.py [--faces 1,10,40] [--width 1280 --height 720]
+
+The resized path scales every face to 200x200 before building its LBP codes
+and grid histograms, as the live feed did for `LBPHFaceRecognizer.predict`.
+The native path (`LBPHGallery.frame_histograms`) describes each crop at its
+detected size, as FaceTrainer stores the training faces. Both are per-crop
+extraction; the gain comes only from not upscaling small faces.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from LBPHGallery import LBPHGallery, LBPHModel  # noqa: E402
+
+
+def lecture_hall(rng, count, width, height):
+    # Faces of a seated audience: small, spread over the whole frame
+    frame = cv2.GaussianBlur((rng.random((height, width)) * 255).astype(np.uint8), (5, 5), 0)
+    boxes = []
+    for _ in range(count):
+        side = int(rng.integers(32, 96))
+        x, y = int(rng.integers(0, width - side)), int(rng.integers(0, height - side))
+        boxes.append((x, y, x + side, y + side))
+    return frame, boxes
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--faces', default='1,10,40')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    gallery = LBPHGallery(LBPHModel(np.zeros((0, 8 * 8 * 256)), []))
+    print(f"{'faces':>6}{'resized ms':>12}{'native ms':>11}{'speedup':>9}")
+    for count in (int(n) for n in args.faces.split(',')):
+        gray, boxes = lecture_hall(rng, count, args.width, args.height)
+
+        def resized():
+            return [gallery.histogram(cv2.resize(gray[y:y1, x:x1], (200, 200))) for (x, y, x1, y1) in boxes]
+
+        resized_ms = timed(resized, args.repeats)
+        native_ms = timed(lambda: gallery.frame_histograms(gray, boxes), args.repeats)
+        print(f"{count:>6}{resized_ms:>12.1f}{native_ms:>11.1f}{resized_ms / native_ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Memory and matching cost of the LBPH gallery in each histogram storage.
+
+Usage:
+    python benchmarks/benchmark_gallery_storage.py [--sizes 500,2000,8000] [--faces 10]
+
+A gallery of `--sizes` real LBPH histograms (of synthetic face crops at the
+detector's native size, as FaceTrainer stores them) is kept as float32,
+float16 and uint8 counts with a per-row scale. For each storage the memory
+of the stored histograms, the time to match one frame's faces, the share of
+rows stored exactly, the largest relative distance error and whether every
+label matches the float32 gallery are reported.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from LBPHGallery import STORAGES, LBPHGallery, LBPHModel, lbp_codes, spatial_histogram  # noqa: E402
+
+
+def synthetic_histograms(rng, count):
+    histograms = np.empty((count, 64 * 256), dtype=np.float32)
+    for i in range(count):
+        side = int(rng.integers(80, 160))
+        face = cv2.GaussianBlur((rng.random((side, side)) * 255).astype(np.uint8), (7, 7), 0)
+        histograms[i] = spatial_histogram(lbp_codes(face))
+    return histograms
+
+
+def timed_distances(gallery, queries, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        dist = gallery.distances(queries)
+        best = min(best, time.perf_counter() - start)
+    return dist, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='500,2000,8000')
+    parser.add_argument('--faces', type=int, default=10, help='faces matched per frame')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sizes = [int(s) for s in args.sizes.split(',')]
+    histograms = synthetic_histograms(rng, max(sizes))
+    queries = synthetic_histograms(rng, args.faces)
+
+    print(f"{'rows':>6}  {'storage':<9}{'MB':>8}{'match ms':>10}{'exact rows':>12}{'max rel err':>13}  same labels")
+    for size in sizes:
+        model = LBPHModel(histograms[:size], np.arange(size))
+        reference, _ = timed_distances(LBPHGallery(model), queries, repeats=1)
+        for storage in STORAGES:
+            stored = model.quantized(storage)
+            nbytes = stored.codes.nbytes + (stored.scales.nbytes if stored.scales is not None else 0)
+            dist, seconds = timed_distances(LBPHGallery(stored), queries)
+            exact = np.all(stored.histograms == model.histograms, axis=1).mean()
+            error = np.max(np.abs(dist - reference) / np.maximum(reference, 1e-12))
+            same = np.array_equal(dist.argmin(axis=1), reference.argmin(axis=1))
+            print(f"{size:>6}  {storage:<9}{nbytes / 1e6:>8.1f}{seconds * 1000:>10.1f}{exact:>12.1%}"
+                  f"{error:>13.2e}  {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Speed of the vectorized LBPHGallery against LBPHFaceRecognizer.predict.
+
+Usage:
+    python benchmarks/benchmark_lbph_gallery.py [--identities 50,500,5000] [--samples 1] [--faces 10]
+
+For each gallery size a synthetic LBPH model is trained with OpenCV, then a
+frame's worth of query faces is recognised with one `predict` call per face
+and with a single `LBPHGallery.predict_batch` call. Labels are checked to be
+identical.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from LBPHGallery import LBPHGallery  # noqa: E402
+
+
+def synthetic_faces(rng, count, size=None):
+    # Smoothed noise gives LBP histograms with face-like sparsity. Training
+    # crops keep the detector's native size, like FaceTrainer stores them
+    faces = []
+    for _ in range(count):
+        side = size or int(rng.integers(80, 160))
+        noise = (rng.random((side, side)) * 255).astype(np.uint8)
+        faces.append(cv2.GaussianBlur(noise, (7, 7), 0))
+    return faces
+
+
+def run(identities, samples, n_faces, repeats, rng):
+    labels = np.repeat(np.arange(1, identities + 1), samples).astype(np.int32)
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(synthetic_faces(rng, len(labels)), labels)
+    gallery = LBPHGallery.from_recognizer(recognizer)
+    queries = synthetic_faces(rng, n_faces, size=200)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        expected = [recognizer.predict(face) for face in queries]
+    opencv_ms = (time.perf_counter() - start) / repeats * 1000.0
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        got = gallery.predict_batch(queries)
+    gallery_ms = (time.perf_counter() - start) / repeats * 1000.0
+
+    same = all(e[0] == g[0] for e, g in zip(expected, got))
+    max_diff = max(abs(e[1] - g[1]) for e, g in zip(expected, got))
+    return opencv_ms, gallery_ms, same, max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--identities', default='50,500,5000')
+    parser.add_argument('--samples', type=int, default=1, help='stored samples per identity')
+    parser.add_argument('--faces', type=int, default=10, help='faces recognised per frame')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'identities':>10}{'samples':>9}{'predict ms':>12}{'gallery ms':>12}{'speedup':>9}"
+          f"{'labels':>8}{'max |dd|':>10}")
+    for identities in (int(n) for n in args.identities.split(',')):
+        opencv_ms, gallery_ms, same, max_diff = run(identities, args.samples, args.faces, args.repeats, rng)
+        print(f"{identities:>10}{identities * args.samples:>9}{opencv_ms:>12.1f}{gallery_ms:>12.1f}"
+              f"{opencv_ms / gallery_ms:>8.1f}x{'same' if same else 'DIFF':>8}{max_diff:>10.1e}")
+
+
+if __name__ == '__main__':
+    main()
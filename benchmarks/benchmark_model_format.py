@@ -0,0 +1,73 @@
+"""Size and load time of the binary LBPH model against OpenCV's trainer.yml.
+
+Usage:
+    python benchmarks/benchmark_model_format.py [--samples 1500] [--queries 10]
+
+A synthetic gallery of `--samples` LBPH histograms (8x8 cells of 256 bins,
+about as sparse as real face crops) is written as trainer.yml and as
+trainer.lbph. Loading means what FaceRecognizer does at start-up and after
+training: read the model, build the LBPHGallery and match the first frame's
+faces. The binary file is loaded both memory-mapped and fully read.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from LBPHGallery import LBPHGallery, LBPHModel, read_lbph_binary, read_lbph_model  # noqa: E402
+from LBPHGallery import write_lbph_binary, write_lbph_model  # noqa: E402
+
+
+def synthetic_histograms(rng, count, cells=64, bins=256, pixels=144):
+    # Each cell of a ~100 px crop spreads ~144 LBP codes over a few dozen patterns
+    histograms = np.zeros((count, cells, bins), dtype=np.float32)
+    for i in range(count):
+        codes = rng.zipf(1.6, (cells, pixels)) % bins
+        for c in range(cells):
+            histograms[i, c] = np.bincount(codes[c], minlength=bins) / pixels
+    return histograms.reshape(count, -1)
+
+
+def timed_load(read, path, queries):
+    start = time.perf_counter()
+    gallery = LBPHGallery(read(path))
+    loaded = time.perf_counter() - start
+    gallery.match(queries)
+    return loaded, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=1500)
+    parser.add_argument('--queries', type=int, default=10, help='faces matched after loading')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    histograms = synthetic_histograms(rng, args.samples)
+    model = LBPHModel(histograms, rng.integers(1, 50, args.samples))
+    queries = synthetic_histograms(rng, args.queries)
+    directory = tempfile.mkdtemp()
+    yml_path, lbph_path = os.path.join(directory, 'trainer.yml'), os.path.join(directory, 'trainer.lbph')
+
+    print(f"{'format':<16}{'MB':>8}{'write s':>9}{'load ms':>10}{'+match ms':>11}")
+    for name, path, write, read in (
+            ('yml', yml_path, write_lbph_model, read_lbph_model),
+            ('lbph (mmap)', lbph_path, write_lbph_binary, lambda p: read_lbph_binary(p, mmap=True)),
+            ('lbph (read)', lbph_path, None, lambda p: read_lbph_binary(p, mmap=False))):
+        start = time.perf_counter()
+        if write is not None:
+            write(model, path)
+        written = time.perf_counter() - start
+        loaded, matched = timed_load(read, path, queries)
+        print(f"{name:<16}{os.path.getsize(path) / 1e6:>8.1f}{written if write else float('nan'):>9.2f}"
+              f"{loaded * 1000:>10.1f}{matched * 1000:>11.1f}")
+    os.remove(yml_path)
+    os.remove(lbph_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Measure per-frame allocations of the live frame path with tracemalloc.
+
+Usage:
+    python benchmarks/frame_allocations.py [--source video.mp4] [--frames 200] [--width 640 --height 480]
+
+Compares the original path (fresh gray frame, blobFromImage, ROI resize and
+BGR->RGB copy on every frame) with the preallocated path used by
+FaceRecognizer (pooled capture buffer, FrameScratch, SSDBlobBuilder, LBPH
+histograms of the native-size face box, one BGR888 display copy). Reports the peak bytes allocated while handling one frame.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from FaceDetector import SSDBlobBuilder  # noqa: E402
+from FrameBuffers import FrameBufferPool, FrameScratch  # noqa: E402
+from LBPHGallery import LBPHGallery, LBPHModel  # noqa: E402
+
+FACE_BOX = (0.3, 0.25, 0.55, 0.7)
+
+
+def face_box(gray):
+    (h, w) = gray.shape
+    return (int(FACE_BOX[0] * w), int(FACE_BOX[1] * h), int(FACE_BOX[2] * w), int(FACE_BOX[3] * h))
+
+
+def face_roi(gray):
+    x, y, x1, y1 = face_box(gray)
+    return gray[y:y1, x:x1]
+
+
+def original_path(read):
+    ret, frame = read(None)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    np.mean(gray)
+    cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0))
+    cv2.resize(face_roi(gray), (200, 200))
+    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def make_buffered_path(shape):
+    pool = FrameBufferPool(shape)
+    scratch = FrameScratch(shape)
+    blob_builder = SSDBlobBuilder()
+    # Only the model parameters matter for computing a frame's histograms
+    gallery = LBPHGallery(LBPHModel(np.zeros((0, 64 * 256), dtype=np.float32), []))
+
+    def buffered_path(read):
+        buf = pool.acquire()
+        ret, frame = read(buf)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=scratch.gray)
+        cv2.mean(gray)
+        blob_builder.build([frame])
+        gallery.frame_histograms(gray, [face_box(gray)])
+        # The display gets its own copy, shown as QImage.Format_BGR888 without an RGB conversion
+        frame.copy()
+        pool.release(frame)
+
+    return buffered_path
+
+
+def make_reader(source, shape):
+    if source is None:
+        rng = np.random.default_rng(0)
+        synthetic = (rng.random(shape) * 255).astype(np.uint8)
+
+        def read(buf):
+            if buf is None:
+                return True, synthetic.copy()
+            np.copyto(buf, synthetic)
+            return True, buf
+        return read
+
+    cap = cv2.VideoCapture(source)
+
+    def read(buf):
+        ret, frame = cap.read(image=buf) if buf is not None else cap.read()
+        if not ret:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = cap.read(image=buf) if buf is not None else cap.read()
+        return ret, frame
+    return read
+
+
+def measure(path, read, frames):
+    for _ in range(5):
+        path(read)
+    peaks = []
+    tracemalloc.start()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        path(read)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+    return np.array(peaks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=None, help='video file to read frames from (default: synthetic)')
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    args = parser.parse_args()
+
+    shape = (args.height, args.width, 3)
+    if args.source is not None:
+        ret, first = cv2.VideoCapture(args.source).read()
+        if not ret:
+            print(f"[ERROR] Unable to read {args.source}")
+            return
+        shape = first.shape
+
+    read = make_reader(args.source, shape)
+    before = measure(original_path, read, args.frames)
+    after = measure(make_buffered_path(shape), read, args.frames)
+
+    print(f"[INFO] {args.frames} frames at {shape[1]}x{shape[0]}")
+    print(f"{'path':<12}{'mean KiB/frame':>16}{'max KiB/frame':>16}")
+    for name, peaks in (('original', before), ('buffered', after)):
+        print(f"{name:<12}{peaks.mean() / 1024:>16.1f}{peaks.max() / 1024:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
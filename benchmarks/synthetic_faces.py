@@ -0,0 +1,15 @@
+"""Synthetic face-like images shared by the gallery benchmarks."""
+import cv2
+import numpy as np
+
+
+def identity(rng, size=96):
+    # Texture, contrast and a few blobs for eyes, brows and mouth differ per person
+    k = int(rng.choice([3, 5, 7, 9]))
+    face = cv2.GaussianBlur((rng.random((size, size)) * 255).astype(np.uint8), (k, k), 0).astype(np.float32)
+    face = face * rng.uniform(0.5, 1.5) + rng.uniform(-40, 40)
+    for _ in range(6):
+        center = (int(rng.integers(10, size - 10)), int(rng.integers(10, size - 10)))
+        axes = (int(rng.integers(4, 20)), int(rng.integers(3, 12)))
+        cv2.ellipse(face, center, axes, float(rng.uniform(0, 180)), 0, 360, float(rng.uniform(0, 255)), -1)
+    return np.clip(face, 0, 255).astype(np.uint8)
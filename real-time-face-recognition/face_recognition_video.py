@@ -1,21 +1,23 @@
 import cv2
-import numpy as np
-import json
 import os
+import sys
+
+# Shared detection and recognition helpers live with the app modules in Frontend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from FaceDetector import postprocess_detections  # noqa: E402
+from RecognitionBackends import LBPHBackend  # noqa: E402
+from UserRegistry import UserRegistry  # noqa: E402
 
 
 def recognize_faces_in_video(video_path):
-    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    trainer_yml_path = os.path.join(repo_root, 'trainer.yml')
-    if not os.path.exists(trainer_yml_path):
-        print(f"[ERROR] Trainer file 'trainer.yml' not found at: {trainer_yml_path}")
+    # trainer.lbph, or a trainer.yml that was not converted yet
+    recognizer = LBPHBackend()
+    if not recognizer.load():
+        print(f"[ERROR] Trainer file not found at: {recognizer.gallery_path}")
         return
+    print(f"[INFO] Face recognizer loaded ({len(recognizer)} samples)")
 
-    # Ensure names.json exists
-    names_path = os.path.join(repo_root, 'names.json')
-    if not os.path.exists(names_path):
-        print("[ERROR] Names file 'names.json' not found.")
-        return
+    registry = UserRegistry()
 
     # Face detection model paths
     proto_path = os.path.join(os.path.dirname(__file__), 'deploy.prototxt')
@@ -29,18 +31,9 @@ def recognize_faces_in_video(video_path):
         print(f"[ERROR] Video file not found: {video_path}")
         return
 
-    # Load Face Recognizer
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    recognizer.read(trainer_yml_path)
-    print(f"[INFO] Face recognizer loaded from: {trainer_yml_path}")
-
     # Load Deep Learning Face Detector
     net = cv2.dnn.readNetFromCaffe(proto_path, model_path)
 
-    # Load user names
-    with open(names_path, 'r') as f:
-        names_data = json.load(f)
-
     # Open video file
     cap = cv2.VideoCapture(video_path)
 
@@ -63,39 +56,25 @@ def recognize_faces_in_video(video_path):
         net.setInput(blob)
         detections = net.forward()
 
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.7:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (x, y, x1, y1) = box.astype("int")
-
-                # Draw rectangle around detected face
-                cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
-
-                # Convert to grayscale and extract face ROI
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                face_roi = gray[y:y1, x:x1]
-
-                # Ensure ROI is valid before resizing
-                if face_roi.shape[0] > 0 and face_roi.shape[1] > 0:
-                    face_roi = cv2.resize(face_roi, (200, 200))
-                else:
-                    continue  # Skip to next face if ROI is invalid
-
-                try:
-                    id, conf = recognizer.predict(face_roi)
-
-                    if conf < 50:
-                        name = names_data.get(str(id), "Unknown")
-                        confidence_text = f"{round(100 - conf)}%"
-                    else:
-                        name, confidence_text = "Unknown", "N/A"
-                except Exception:
-                    name, confidence_text = "Unknown", "N/A"
-
-                # Display name & confidence
-                cv2.putText(frame, name, (x, y - 10), font, 1, (255, 255, 255), 2)
-                cv2.putText(frame, confidence_text, (x, y1 + 20), font, 1, (255, 255, 0), 1)
+        # Convert to grayscale once per frame for face ROIs
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        boxes = postprocess_detections(detections, w, h, 0.7)
+        # Every face of the frame is matched at once, on its native-size crop like the training faces
+        for (x, y, x1, y1), (id, conf) in zip(boxes, recognizer.predict_boxes(frame, boxes, gray)):
+            # Draw rectangle around detected face
+            cv2.rectangle(frame, (x, y), (x1, y1), (0, 255, 0), 2)
+
+            if conf < 50:
+                person = registry.get(id)
+                name = person["name"] if person is not None else "Unknown"
+                confidence_text = f"{round(100 - conf)}%"
+            else:
+                name, confidence_text = "Unknown", "N/A"
+
+            # Display name & confidence
+            cv2.putText(frame, name, (x, y - 10), font, 1, (255, 255, 255), 2)
+            cv2.putText(frame, confidence_text, (x, y1 + 20), font, 1, (255, 255, 0), 1)
 
         # Show video frame
         cv2.imshow('Face Recognition', frame)
@@ -1,50 +1,28 @@
 import numpy as np
-import json
 import cv2
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from SampleManifest import SampleManifest
+from UserRegistry import UserRegistry
 
 def create_directory(directory: str) -> None:
     """Create a directory if it doesn't exist."""
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def get_face_id(directory: str) -> int:
-    """Get the next available user ID based on stored images."""
-    user_ids = set()
-    for filename in os.listdir(directory):
-        try:
-            number = int(filename.split("-")[1])
-            user_ids.add(number)
-        except (IndexError, ValueError):
-            continue
-    return min(set(range(1, max(user_ids, default=0) + 2)) - user_ids)
-
-
-def save_name(face_id: int, face_name: str, roll_no: str, contact: str, filename: str) -> None:
-    """Save user details (Name, Roll No, Contact) in a JSON file."""
-    names_data = {}
-
-    if os.path.exists(filename):
-        with open(filename, 'r') as fs:
-            try:
-                names_data = json.load(fs)
-            except json.JSONDecodeError:
-                pass
-
-    # Store details
-    names_data[str(face_id)] = {
-        "name": face_name,
-        "roll_no": roll_no,
-        "contact": contact
-    }
-
-    with open(filename, 'w') as fs:
-        json.dump(names_data, fs, ensure_ascii=False, indent=4)
+def register_user(manifest: SampleManifest, face_name: str, roll_no: str, contact: str) -> int:
+    """Save user details (Name, Roll No, Contact) in the user registry and return their ID.
+
+    Allocated like the app's capture: a registered roll number keeps its ID,
+    anyone else gets one free in both the manifest and the registry.
+    """
+    return UserRegistry().register(manifest, face_name, roll_no, contact)
 
 if __name__ == '__main__':
     directory = 'images'
     cascade_classifier_filename = '.\\real-time-face-recognition\\haarcascade_frontalface_default.xml'
-    names_json_filename = 'names.json'
 
     # Create necessary directories
     create_directory(directory)
@@ -66,8 +44,9 @@ if __name__ == '__main__':
     roll_no = input('Enter roll number: ')
     contact = input('Enter contact number: ')
 
-    face_id = get_face_id(directory)
-    save_name(face_id, face_name, roll_no, contact, names_json_filename)
+    manifest = SampleManifest(directory)
+    # Registered with the first saved face, so an aborted capture leaves no one behind
+    face_id = None
 
     print('\n[INFO] Initializing face capture. Look at the camera and wait...')
     # Load the deep learning face detector
@@ -95,8 +74,10 @@ if __name__ == '__main__':
 
                 # Save face images
                 face_crop = img[y:y1, x:x1]
+                if face_id is None:
+                    face_id = register_user(manifest, face_name, roll_no, contact)
                 count += 1
-                cv2.imwrite(f'images/User-{face_id}-{count}.jpg', face_crop)
+                manifest.save_face(face_id, count, face_crop)
 
         cv2.imshow('Face Capture', img)
 
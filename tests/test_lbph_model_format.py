@@ -0,0 +1,112 @@
+"""Round trips of the LBPH model between OpenCV's trainer.yml and the binary trainer.lbph."""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from LBPHGallery import (_HEADER, STORAGES, LBPHGallery, load_lbph_model, read_lbph_binary,  # noqa: E402
+                         read_lbph_model, save_lbph_model, write_lbph_binary)
+
+PARAMETERS = ('radius', 'neighbors', 'grid_x', 'grid_y', 'threshold')
+
+
+def synthetic_faces(rng, count):
+    faces = []
+    for _ in range(count):
+        side = int(rng.integers(60, 120))
+        faces.append(cv2.GaussianBlur((rng.random((side, side)) * 255).astype(np.uint8), (5, 5), 0))
+    return faces
+
+
+@pytest.fixture(scope='module')
+def trained(tmp_path_factory):
+    """A trainer.yml written by OpenCV itself, with non-default parameters, and faces to query it with."""
+    rng = np.random.default_rng(0)
+    faces = synthetic_faces(rng, 24)
+    recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=7, grid_y=6, threshold=60.0)
+    recognizer.train(faces, np.repeat(np.arange(1, 9), 3).astype(np.int32))
+    path = str(tmp_path_factory.mktemp('model') / 'trainer.yml')
+    recognizer.write(path)
+    # Training faces are exact matches; the rest are strangers, some above the threshold
+    return path, faces[::4] + synthetic_faces(rng, 4)
+
+
+def assert_same_model(model, expected):
+    for name in PARAMETERS:
+        assert getattr(model, name) == getattr(expected, name)
+    np.testing.assert_array_equal(model.labels, expected.labels)
+    np.testing.assert_array_equal(model.histograms, expected.histograms)
+    gallery, reference = LBPHGallery(model), LBPHGallery(expected)
+    queries = np.vstack([reference.histogram(face) for face in synthetic_faces(np.random.default_rng(1), 4)])
+    assert gallery.match(queries) == reference.match(queries)
+
+
+def test_yml_to_lbph_to_yml(trained, tmp_path):
+    path, faces = trained
+    model = read_lbph_model(path)
+    binary = str(tmp_path / 'trainer.lbph')
+    save_lbph_model(model, binary)
+    back = str(tmp_path / 'back.yml')
+    save_lbph_model(load_lbph_model(binary), back)
+
+    assert_same_model(read_lbph_model(back), model)
+    gallery = LBPHGallery(read_lbph_model(back))
+    assert gallery.predict_batch(faces) == LBPHGallery(model).predict_batch(faces)
+
+    # OpenCV reads the converted file back and predicts as it did with its own
+    original = cv2.face.LBPHFaceRecognizer_create()
+    original.read(path)
+    converted = cv2.face.LBPHFaceRecognizer_create()
+    converted.read(back)
+    for name in ('Radius', 'Neighbors', 'GridX', 'GridY', 'Threshold'):
+        assert getattr(converted, 'get' + name)() == getattr(original, 'get' + name)()
+    for face in faces:
+        assert converted.predict(face) == original.predict(face)
+
+
+@pytest.mark.parametrize('storage', STORAGES)
+@pytest.mark.parametrize('mmap', [True, False])
+def test_lbph_v2_read_back(trained, tmp_path, storage, mmap):
+    path, faces = trained
+    model = read_lbph_model(path).quantized(storage)
+    binary = str(tmp_path / 'trainer.lbph')
+    write_lbph_binary(model, binary)
+
+    loaded = read_lbph_binary(binary, mmap=mmap)
+    assert loaded.storage == storage
+    np.testing.assert_array_equal(loaded.codes, model.codes)
+    assert_same_model(loaded, model)
+    assert LBPHGallery(loaded).predict_batch(faces) == LBPHGallery(model).predict_batch(faces)
+
+
+def test_lbph_v1_read_back(trained, tmp_path):
+    path, faces = trained
+    model = read_lbph_model(path)
+    binary = str(tmp_path / 'trainer.lbph')
+    write_lbph_binary(model, binary)
+    # A version 1 file is a float32 one whose header ends after `histograms_offset`
+    header = np.fromfile(binary, dtype=_HEADER, count=1)
+    header['version'] = 1
+    header['storage'] = 0
+    header['scales_offset'] = 0
+    with open(binary, 'r+b') as f:
+        f.write(header.tobytes())
+
+    loaded = read_lbph_binary(binary)
+    assert loaded.storage == 'float32'
+    assert_same_model(loaded, model)
+    assert LBPHGallery(loaded).predict_batch(faces) == LBPHGallery(model).predict_batch(faces)
+
+
+def test_unsupported_version(trained, tmp_path):
+    binary = str(tmp_path / 'trainer.lbph')
+    write_lbph_binary(read_lbph_model(trained[0]), binary)
+    header = np.fromfile(binary, dtype=_HEADER, count=1)
+    header['version'] = 99
+    with open(binary, 'r+b') as f:
+        f.write(header.tobytes())
+    with pytest.raises(ValueError):
+        read_lbph_binary(binary)
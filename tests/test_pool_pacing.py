@@ -0,0 +1,36 @@
+"""Frame pacing of the live feed when inference runs in worker processes."""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+import UserRegistry  # noqa: E402
+from FaceRecognizer import FaceRecognizer  # noqa: E402
+
+
+def test_pool_results_are_measured(tmp_path, monkeypatch):
+    monkeypatch.setattr(UserRegistry, 'DEFAULT_DB_PATH', str(tmp_path / 'insightx.db'))
+    # No model on disk is needed: the workers only detect
+    recognizer = FaceRecognizer(detector='haar', workers=1, recognizer='lbph')
+    camera = recognizer.streams[0]
+    recognizer.running = True
+    loop = threading.Thread(target=recognizer._pool_inference_loop, daemon=True)
+    loop.start()
+    try:
+        frame = np.full((240, 320, 3), 120, dtype=np.uint8)
+        deadline = time.monotonic() + 30.0
+        # Until a few results were published and the once-a-second report ran
+        while camera.frame_index < 5 or camera.status['budget_utilization'] == 0.0:
+            assert time.monotonic() < deadline, "no pool results measured"
+            camera.mailbox.put(frame.copy())
+            time.sleep(0.02)
+    finally:
+        recognizer.running = False
+        loop.join(timeout=10.0)
+
+    assert recognizer.pacer.utilization > 0
+    assert recognizer.pacer.fps > 0
+    assert camera.status['budget_utilization'] > 0
@@ -0,0 +1,56 @@
+"""User ID allocation of the registry, shared by the app's capture and face_taker.py."""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Frontend'))
+from SampleManifest import SampleManifest  # noqa: E402
+from UserRegistry import UserRegistry  # noqa: E402
+
+
+class SlowManifest(SampleManifest):
+    """Widens the window between reading a free ID and registering it."""
+
+    def next_user_id(self):
+        user_id = super().next_user_id()
+        time.sleep(0.02)
+        return user_id
+
+
+def open_registry(tmp_path):
+    return UserRegistry(str(tmp_path / 'insightx.db'), names_json=str(tmp_path / 'names.json'))
+
+
+def test_register_skips_ids_taken_in_either_table(tmp_path):
+    manifest = SampleManifest(str(tmp_path / 'images'), str(tmp_path / 'insightx.db'))
+    registry = open_registry(tmp_path)
+    registry.add(1, 'No Photos', 'R1')
+    manifest.save_face(2, 1, np.zeros((20, 20, 3), dtype=np.uint8))
+
+    assert registry.register(manifest, 'New', 'R3') == 3
+    # A registered roll number keeps its ID and is updated in place
+    assert registry.register(manifest, 'Renamed', 'R1') == 1
+    assert registry.get(1)['name'] == 'Renamed'
+
+
+def test_concurrent_registrations_get_distinct_ids(tmp_path):
+    SampleManifest(str(tmp_path / 'images'), str(tmp_path / 'insightx.db')).scan()
+    barrier = threading.Barrier(8)
+    ids = []
+
+    def register(k):
+        # One connection each, as separate processes would have
+        manifest = SlowManifest(str(tmp_path / 'images'), str(tmp_path / 'insightx.db'))
+        registry = open_registry(tmp_path)
+        barrier.wait()
+        ids.append(registry.register(manifest, f'Person {k}', f'R{k}'))
+
+    threads = [threading.Thread(target=register, args=(k,)) for k in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(ids) == list(range(1, 9))